@@ -14,3 +14,30 @@
 # limitations under the License.
 
 __author__ = 'Andrea Biancini <andrea.biancini@gmail.com>'
+
+from kruskal import MSTSolver
+from prim import PrimSolver
+from boruvka import BoruvkaSolver
+import vectorized
+from components import ComponentSolver
+
+ALGORITHMS = {
+    'kruskal': MSTSolver,
+    'prim': PrimSolver,
+    'boruvka': BoruvkaSolver,
+}
+
+if vectorized.numpy is not None:
+    ALGORITHMS['numpy'] = vectorized.VectorizedSolver
+
+def register(name, solver_class):
+    ALGORITHMS[name] = solver_class
+
+def get_solver(name, split_components=False, workers=0):
+    if name not in ALGORITHMS:
+        raise ValueError('Unknown MST algorithm %s, available ones are: %s.' % (name, ', '.join(sorted(ALGORITHMS))))
+    if split_components:
+        return ComponentSolver(ALGORITHMS[name], workers)
+    return ALGORITHMS[name]()
+
+__all__ = ['ALGORITHMS', 'register', 'get_solver', 'MSTSolver', 'PrimSolver', 'BoruvkaSolver', 'ComponentSolver']
@@ -0,0 +1,60 @@
+# Copyright (C) 2014 Andrea Biancini <andrea.biancini@gmail.com>.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+__author__ = 'Andrea Biancini <andrea.biancini@gmail.com>'
+
+"""
+Boruvka's algorithm for minimum spanning trees: every round joins each
+component to its cheapest neighbour, halving the number of components.
+"""
+
+from kruskal import MSTSolver
+
+class BoruvkaSolver(MSTSolver):
+    def spanning_forest(self, vertices):
+        sources = self.sources
+        destinations = self.destinations
+        costs = self.costs
+        sets = self.sets
+        sets.reset(vertices)
+        in_tree = [False] * len(costs)
+        components = vertices
+
+        while components > 1:
+            # Ties are broken on the position in the input, as in Kruskal,
+            # so that the cheapest edges never close a cycle
+            cheapest = {}
+            for position in range(len(costs)):
+                root1 = sets.find(sources[position])
+                root2 = sets.find(destinations[position])
+                if root1 == root2:
+                    continue
+                weight = (costs[position], position)
+                for root in (root1, root2):
+                    best = cheapest.get(root)
+                    if best is None or weight < best:
+                        cheapest[root] = weight
+
+            if not cheapest:
+                break
+
+            for cost, position in cheapest.values():
+                if sets.union(sources[position], destinations[position]):
+                    in_tree[position] = True
+                    components -= 1
+        return in_tree
+
+def perform(topo_edges):
+    return BoruvkaSolver().perform(topo_edges)
@@ -0,0 +1,126 @@
+# Copyright (C) 2014 Andrea Biancini <andrea.biancini@gmail.com>.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+__author__ = 'Andrea Biancini <andrea.biancini@gmail.com>'
+
+"""
+Splits the topology into its connected components and computes the tree of
+each one separately, optionally on a pool of worker processes. Components
+that did not change since the previous run reuse their previous tree.
+"""
+
+import logging
+import time
+from multiprocessing import Pool
+from union_find import UnionFind
+from kruskal import SOLVE_TIME
+from ..metrics import registry
+
+CACHED_COMPONENTS = registry.counter('greenmst_cached_components_total',
+                                     'Connected components whose tree was reused from the previous run')
+COMPONENT_SOLVE_TIME = registry.histogram('greenmst_component_solve_seconds',
+                                          'Time spent computing the tree of a connected component, by power '
+                                          'of ten above its number of edges', 'edges')
+
+LOG = logging.getLogger(__name__)
+
+def size_class(edges):
+    # Smallest power of ten above the number of edges, as a label value
+    return str(10 ** len(str(edges)))
+
+def split_components(topo_edges):
+    indices = {}
+    for edge in topo_edges:
+        for vertex in (edge.src, edge.dst):
+            if vertex not in indices:
+                indices[vertex] = len(indices)
+
+    sets = UnionFind(len(indices))
+    for edge in topo_edges:
+        sets.union(indices[edge.src], indices[edge.dst])
+
+    components = {}
+    for position, edge in enumerate(topo_edges):
+        components.setdefault(sets.find(indices[edge.src]), []).append(position)
+    return list(components.values())
+
+def _solve_component(args):
+    solver_class, edges = args
+    start = time.time()
+    in_tree = solver_class().solve(edges)
+    chosen = frozenset(edge.key for edge, selected in zip(edges, in_tree) if selected)
+    return chosen, time.time() - start
+
+class ComponentSolver(object):
+    def __init__(self, solver_class, workers=0):
+        self.solver_class = solver_class
+        self.workers = workers
+        self.pool = None
+        self.cache = {}
+        self.timings = []
+
+    def _map(self, jobs):
+        if self.workers <= 0 or len(jobs) < 2:
+            return [_solve_component(job) for job in jobs]
+
+        if self.pool is None:
+            self.pool = Pool(self.workers)
+        return self.pool.map(_solve_component, jobs)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool = None
+
+    def solve(self, topo_edges):
+        cache = {}
+        timings = []
+        jobs = []
+        signatures = []
+        for positions in split_components(topo_edges):
+            edges = [topo_edges[position] for position in positions]
+            signature = frozenset((edge.key, edge.cost) for edge in edges)
+            if signature in self.cache:
+                cache[signature] = self.cache[signature]
+                CACHED_COMPONENTS.inc()
+                timings.append({'edges': len(edges), 'seconds': 0.0, 'cached': True})
+            else:
+                jobs.append((self.solver_class, edges))
+                signatures.append(signature)
+
+        results = self._map(jobs)
+        for signature, job, (chosen, seconds) in zip(signatures, jobs, results):
+            cache[signature] = chosen
+            timings.append({'edges': len(job[1]), 'seconds': seconds, 'cached': False})
+            COMPONENT_SOLVE_TIME.observe(seconds, size_class(len(job[1])))
+        if jobs:
+            slowest = max(results, key=lambda result: result[1])
+            LOG.debug('Computed %s of %s component trees, slowest in %.3f ms.',
+                      len(jobs), len(timings), slowest[1] * 1000)
+
+        # Only the trees of the current components are kept
+        self.cache = cache
+        self.timings = timings
+
+        chosen = set()
+        for keys in cache.values():
+            chosen.update(keys)
+        return [edge.key in chosen for edge in topo_edges]
+
+    def perform(self, topo_edges):
+        with SOLVE_TIME.time(type(self).__name__):
+            topo_edges = list(topo_edges)
+            in_tree = self.solve(topo_edges)
+            return [edge for edge, selected in zip(topo_edges, in_tree) if selected]
@@ -0,0 +1,233 @@
+# Copyright (C) 2014 Andrea Biancini <andrea.biancini@gmail.com>.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+__author__ = 'Andrea Biancini <andrea.biancini@gmail.com>'
+
+"""
+Dynamic minimum spanning forest. Edges can be inserted, deleted or have
+their cost changed without recomputing the whole tree: every operation
+returns the edges that entered and left the tree.
+"""
+
+from union_find import UnionFind
+
+def _weight(link):
+    # Ties on cost are broken on the edge key so that the tree is unique
+    return (link.cost, link.key)
+
+class DynamicMST(object):
+    def __init__(self):
+        self.edges = {}
+        self.tree = {}
+        self.adjacency = {}
+
+    def __contains__(self, link):
+        return link.key in self.tree
+
+    def __len__(self):
+        return len(self.tree)
+
+    def clear(self):
+        self.edges.clear()
+        self.tree.clear()
+        self.adjacency.clear()
+
+    def load(self, topo_edges, mst_edges):
+        self.clear()
+        for edge in topo_edges:
+            self.edges[edge.key] = edge
+        for edge in mst_edges:
+            self._tree_add(self.edges.get(edge.key, edge))
+
+    def get(self, link):
+        return self.tree.get(link.key)
+
+    def tree_edges(self):
+        return set(self.tree.values())
+
+    def insert(self, link):
+        key = link.key
+        if key in self.edges:
+            return self.update_cost(link)
+
+        self.edges[key] = link
+        return self._try_enter(link)
+
+    def delete(self, link):
+        key = link.key
+        stored = self.edges.pop(key, None)
+        if stored is None or key not in self.tree:
+            return [], []
+
+        self._tree_remove(stored)
+        replacement = self._find_replacement(stored.src)
+        if replacement is None:
+            return [], [stored]
+
+        self._tree_add(replacement)
+        return [replacement], [stored]
+
+    def delete_many(self, links):
+        removed = []
+        for link in links:
+            stored = self.edges.pop(link.key, None)
+            if stored is not None and stored.key in self.tree:
+                self._tree_remove(stored)
+                removed.append(stored)
+        if not removed:
+            return [], []
+
+        # Reconnect the pieces of the forest at once, Kruskal-style, over
+        # the components left by the removed tree edges
+        labels, count = self._components()
+        candidates = []
+        for key, edge in self.edges.items():
+            if key in self.tree:
+                continue
+            if labels[edge.src] != labels[edge.dst]:
+                candidates.append(edge)
+        candidates.sort(key=_weight)
+
+        sets = UnionFind(count)
+        added = []
+        for edge in candidates:
+            if sets.union(labels[edge.src], labels[edge.dst]):
+                self._tree_add(edge)
+                added.append(edge)
+        return added, removed
+
+    def update_cost(self, link):
+        key = link.key
+        old = self.edges.get(key)
+        if old is None:
+            return self.insert(link)
+
+        self.edges[key] = link
+        if key in self.tree:
+            self._tree_remove(old)
+            if _weight(link) <= _weight(old):
+                self._tree_add(link)
+                return [], []
+
+            # The edge itself always crosses the cut, so a replacement exists
+            replacement = self._find_replacement(link.src)
+            self._tree_add(replacement)
+            if replacement is link:
+                return [], []
+            return [replacement], [link]
+
+        if _weight(link) >= _weight(old):
+            return [], []
+        return self._try_enter(link)
+
+    def _try_enter(self, link):
+        if link.src == link.dst:
+            return [], []
+
+        path = self._tree_path(link.src, link.dst)
+        if path is None:
+            self._tree_add(link)
+            return [link], []
+
+        heaviest = max(path, key=_weight)
+        if _weight(link) < _weight(heaviest):
+            self._tree_remove(heaviest)
+            self._tree_add(link)
+            return [link], [heaviest]
+        return [], []
+
+    def _tree_add(self, link):
+        key = link.key
+        self.tree[key] = link
+        self.adjacency.setdefault(link.src, {})[key] = link
+        self.adjacency.setdefault(link.dst, {})[key] = link
+
+    def _tree_remove(self, link):
+        key = link.key
+        del self.tree[key]
+        for vertex in (link.src, link.dst):
+            incident = self.adjacency.get(vertex)
+            if incident is None:
+                continue
+            incident.pop(key, None)
+            if not incident:
+                del self.adjacency[vertex]
+
+    def _neighbours(self, vertex):
+        for link in self.adjacency.get(vertex, {}).values():
+            yield link, (link.dst if link.src == vertex else link.src)
+
+    def _tree_path(self, source, destination):
+        if source not in self.adjacency or destination not in self.adjacency:
+            return None
+
+        parents = {source: None}
+        frontier = [source]
+        while frontier and destination not in parents:
+            next_frontier = []
+            for vertex in frontier:
+                for link, neighbour in self._neighbours(vertex):
+                    if neighbour not in parents:
+                        parents[neighbour] = (vertex, link)
+                        next_frontier.append(neighbour)
+            frontier = next_frontier
+
+        if destination not in parents:
+            return None
+
+        path = []
+        vertex = destination
+        while parents[vertex] is not None:
+            vertex, link = parents[vertex]
+            path.append(link)
+        return path
+
+    def _component(self, vertex):
+        component = set([vertex])
+        frontier = [vertex]
+        while frontier:
+            current = frontier.pop()
+            for link, neighbour in self._neighbours(current):
+                if neighbour not in component:
+                    component.add(neighbour)
+                    frontier.append(neighbour)
+        return component
+
+    def _components(self):
+        labels = {}
+        count = 0
+        for vertex in self.adjacency:
+            if vertex not in labels:
+                for member in self._component(vertex):
+                    labels[member] = count
+                count += 1
+        for edge in self.edges.values():
+            for vertex in (edge.src, edge.dst):
+                if vertex not in labels:
+                    labels[vertex] = count
+                    count += 1
+        return labels, count
+
+    def _find_replacement(self, vertex):
+        component = self._component(vertex)
+        best = None
+        for key, edge in self.edges.items():
+            if key in self.tree:
+                continue
+            if (edge.src in component) == (edge.dst in component):
+                continue
+            if best is None or _weight(edge) < _weight(best):
+                best = edge
+        return best
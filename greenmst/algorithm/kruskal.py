@@ -19,59 +19,66 @@ __author__ = 'Andrea Biancini <andrea.biancini@gmail.com>'
 Kruskal's algorithm for minimum spanning trees. D. Eppstein, April 2006.
 """
 
-from ..link import Link
+from union_find import UnionFind
+from ..metrics import registry
 
-parent = dict()
-rank = dict()
+SOLVE_TIME = registry.histogram('greenmst_mst_solve_seconds', 'Time spent computing minimum spanning trees', 'solver')
 
-def _make_set(vertex):
-    parent[vertex] = vertex
-    rank[vertex] = 0
+class MSTSolver(object):
+    def __init__(self):
+        self.indices = {}
+        self.sources = []
+        self.destinations = []
+        self.costs = []
+        self.sets = UnionFind()
 
-def _find(vertex):
-    if parent[vertex] != vertex:
-        parent[vertex] = _find(parent[vertex])
-    return parent[vertex]
+    def _index(self, vertex):
+        indices = self.indices
+        index = indices.get(vertex)
+        if index is None:
+            index = indices[vertex] = len(indices)
+        return index
 
-def _union(vertex1, vertex2):
-    root1 = _find(vertex1)
-    root2 = _find(vertex2)
-    if root1 != root2:
-        if rank[root1] > rank[root2]:
-            parent[root2] = root1
-        else:
-            parent[root1] = root2
-            if rank[root1] == rank[root2]:
-                rank[root2] += 1
+    def load(self, topo_edges):
+        # Map the dpids to dense indices, reusing the buffers of previous runs
+        self.indices.clear()
+        sources = self.sources
+        destinations = self.destinations
+        costs = self.costs
+        del sources[:], destinations[:], costs[:]
 
-def kruskal(graph):
-    for vertice in graph['vertices']:
-        _make_set(vertice)
+        for edge in topo_edges:
+            sources.append(self._index(edge.src))
+            destinations.append(self._index(edge.dst))
+            costs.append(edge.cost)
+        return len(self.indices)
 
-    minimum_spanning_tree = set()
-    edges = list(graph['edges'])
-    edges.sort()
-    for edge in edges:
-        weight, vertice1, vertice2 = edge
-        if _find(vertice1) != _find(vertice2):
-            _union(vertice1, vertice2)
-            minimum_spanning_tree.add(edge)
-    return minimum_spanning_tree
+    def solve(self, topo_edges):
+        return self.spanning_forest(self.load(topo_edges))
 
-def perform(topo_edges):
-    vertices = []
-    edges = []
-    for edge in topo_edges:
-        vertices.append(edge.src)
-        vertices.append(edge.dst)
-        edges.append((edge.cost, edge.src, edge.dst))
+    def spanning_forest(self, vertices):
+        sources = self.sources
+        destinations = self.destinations
+        costs = self.costs
+        sets = self.sets
+        sets.reset(vertices)
+        in_tree = [False] * len(costs)
+        remaining = vertices - 1
+
+        # Sorting is stable, so ties are broken on the order of the input
+        for position in sorted(range(len(costs)), key=costs.__getitem__):
+            if remaining <= 0:
+                break
+            if sets.union(sources[position], destinations[position]):
+                in_tree[position] = True
+                remaining -= 1
+        return in_tree
 
-    graph = { 'vertices': list(set(vertices)), 'edges': set(edges) }
-    mst = kruskal(graph)
+    def perform(self, topo_edges):
+        with SOLVE_TIME.time(type(self).__name__):
+            topo_edges = list(topo_edges)
+            in_tree = self.solve(topo_edges)
+            return [edge for edge, chosen in zip(topo_edges, in_tree) if chosen]
 
-    links = []
-    for curedge in topo_edges:
-        if (curedge.cost, curedge.src, curedge.dst) in mst or \
-           (curedge.cost, curedge.dst, curedge.src) in mst:
-            links.append(curedge)
-    return links
+def perform(topo_edges):
+    return MSTSolver().perform(topo_edges)
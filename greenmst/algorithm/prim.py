@@ -0,0 +1,70 @@
+# Copyright (C) 2014 Andrea Biancini <andrea.biancini@gmail.com>.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+__author__ = 'Andrea Biancini <andrea.biancini@gmail.com>'
+
+"""
+Prim's algorithm for minimum spanning trees, with a binary heap of the
+vertices next to the tree keyed on their cheapest edge to it.
+"""
+
+import heapq
+from kruskal import MSTSolver
+
+class PrimSolver(MSTSolver):
+    def spanning_forest(self, vertices):
+        sources = self.sources
+        destinations = self.destinations
+        costs = self.costs
+
+        # Neighbours of each vertex as (vertex, edge position) pairs
+        adjacency = [[] for vertex in range(vertices)]
+        for position in range(len(costs)):
+            adjacency[sources[position]].append((destinations[position], position))
+            adjacency[destinations[position]].append((sources[position], position))
+
+        # The heap holds a vertex only when its cheapest known edge to the
+        # tree improves (emulating decrease-key), not every edge seen
+        visited = [False] * vertices
+        best = [None] * vertices
+        in_tree = [False] * len(costs)
+        heappush = heapq.heappush
+        heappop = heapq.heappop
+        for root in range(vertices):
+            if visited[root]:
+                continue
+
+            # Ties are broken on the position in the input, as in Kruskal
+            heap = [(0, -1, root)]
+            while heap:
+                cost, position, vertex = heappop(heap)
+                if visited[vertex]:
+                    continue
+
+                visited[vertex] = True
+                if position >= 0:
+                    in_tree[position] = True
+                for other, next_position in adjacency[vertex]:
+                    if visited[other]:
+                        continue
+                    candidate = (costs[next_position], next_position)
+                    known = best[other]
+                    if known is None or candidate < known:
+                        best[other] = candidate
+                        heappush(heap, (candidate[0], next_position, other))
+        return in_tree
+
+def perform(topo_edges):
+    return PrimSolver().perform(topo_edges)
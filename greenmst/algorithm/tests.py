@@ -15,8 +15,17 @@
 
 __author__ = 'Andrea Biancini <andrea.biancini@gmail.com>'
 
-from nose.tools import assert_equals
-from kruskal import perform
+import random
+from nose.tools import assert_equals, assert_true, raises
+from nose.plugins.skip import SkipTest
+from kruskal import perform, MSTSolver
+from union_find import UnionFind
+from . import ALGORITHMS, get_solver
+import prim
+import boruvka
+import vectorized
+from components import ComponentSolver, COMPONENT_SOLVE_TIME, size_class, split_components
+from dynamic import DynamicMST
 from ..link import Link
 
 def test_empty_graph():
@@ -47,3 +56,319 @@ def test_execution():
 
     # assert
     assert_equals(expected, result)
+
+def _total_cost(links):
+    return sum(link.cost for link in links)
+
+def test_dynamic_insert():
+    # arrange
+    mst = DynamicMST()
+    link_ab = Link(src='A', dst='B', cost=1)
+    link_bc = Link(src='B', dst='C', cost=4)
+    link_ac = Link(src='A', dst='C', cost=2)
+
+    # act
+    result_ab = mst.insert(link_ab)
+    result_bc = mst.insert(link_bc)
+    result_ac = mst.insert(link_ac)
+
+    # assert
+    assert_equals(([link_ab], []), result_ab)
+    assert_equals(([link_bc], []), result_bc)
+    assert_equals(([link_ac], [link_bc]), result_ac)
+    assert_equals(2, len(mst))
+    assert_true(link_ab in mst)
+    assert_true(link_ac in mst)
+
+def test_dynamic_insert_heavier():
+    # arrange
+    mst = DynamicMST()
+    mst.insert(Link(src='A', dst='B', cost=1))
+    mst.insert(Link(src='B', dst='C', cost=1))
+
+    # act
+    result = mst.insert(Link(src='A', dst='C', cost=5))
+
+    # assert
+    assert_equals(([], []), result)
+    assert_equals(2, len(mst))
+
+def test_dynamic_delete():
+    # arrange
+    mst = DynamicMST()
+    link_ab = Link(src='A', dst='B', cost=1)
+    link_bc = Link(src='B', dst='C', cost=2)
+    link_ac = Link(src='A', dst='C', cost=3)
+    for link in [link_ab, link_bc, link_ac]:
+        mst.insert(link)
+
+    # act
+    result = mst.delete(Link(src='B', dst='C', cost=2))
+
+    # assert
+    assert_equals(([link_ac], [link_bc]), result)
+    assert_true(link_ac in mst)
+    assert_true(link_bc not in mst)
+
+def test_dynamic_delete_redundant():
+    # arrange
+    mst = DynamicMST()
+    link_ac = Link(src='A', dst='C', cost=3)
+    for link in [Link(src='A', dst='B', cost=1), Link(src='B', dst='C', cost=2), link_ac]:
+        mst.insert(link)
+
+    # act
+    result = mst.delete(link_ac)
+
+    # assert
+    assert_equals(([], []), result)
+    assert_equals(2, len(mst))
+
+def test_dynamic_update_cost():
+    # arrange
+    mst = DynamicMST()
+    link_ab = Link(src='A', dst='B', cost=1)
+    link_bc = Link(src='B', dst='C', cost=2)
+    link_ac = Link(src='A', dst='C', cost=3)
+    for link in [link_ab, link_bc, link_ac]:
+        mst.insert(link)
+
+    # act
+    increased = Link(src='B', dst='C', cost=10)
+    result_increase = mst.update_cost(increased)
+    decreased = Link(src='B', dst='C', cost=1)
+    result_decrease = mst.update_cost(decreased)
+
+    # assert
+    assert_equals(([link_ac], [increased]), result_increase)
+    assert_equals(([decreased], [link_ac]), result_decrease)
+
+def test_dynamic_matches_kruskal():
+    # arrange
+    rand = random.Random(42)
+    vertices = range(12)
+    mst = DynamicMST()
+    edges = []
+
+    # act / assert
+    for i in range(300):
+        action = rand.random()
+        if edges and action < 0.3:
+            edge = edges.pop(rand.randrange(len(edges)))
+            mst.delete(edge)
+        elif edges and action < 0.5:
+            index = rand.randrange(len(edges))
+            edge = edges[index]
+            edges[index] = Link(src=edge.src, dst=edge.dst, src_port=edge.src_port, dst_port=edge.dst_port, cost=rand.randint(1, 20))
+            mst.update_cost(edges[index])
+        else:
+            src, dst = rand.sample(vertices, 2)
+            if any(set([src, dst]) == set([cur.src, cur.dst]) for cur in edges):
+                continue
+            edge = Link(src=src, dst=dst, src_port=i, dst_port=i, cost=rand.randint(1, 20))
+            edges.append(edge)
+            mst.insert(edge)
+
+        assert_equals(_total_cost(perform(edges)), _total_cost(mst.tree_edges()))
+
+def test_solver_reuse():
+    # arrange
+    solver = MSTSolver()
+    first = [Link(src=1, dst=2, cost=1), Link(src=2, dst=3, cost=2), Link(src=1, dst=3, cost=3)]
+    second = [Link(src=7, dst=8, cost=5), Link(src=8, dst=9, cost=1), Link(src=7, dst=9, cost=1)]
+
+    # act
+    result_first = solver.perform(first)
+    result_second = solver.perform(second)
+
+    # assert
+    assert_equals(first[:2], result_first)
+    assert_equals(second[1:], result_second)
+    assert_equals(set([7, 8, 9]), set(solver.indices.keys()))
+
+def test_solver_parallel_links():
+    # arrange
+    edges = []
+    edges.append(Link(src=1, src_port=1, dst=2, dst_port=1, cost=1))
+    edges.append(Link(src=1, src_port=2, dst=2, dst_port=2, cost=1))
+
+    # act
+    result = MSTSolver().perform(edges)
+
+    # assert
+    assert_equals([edges[0]], result)
+
+def test_solver_forest():
+    # arrange
+    edges = [Link(src=1, dst=2, cost=1), Link(src=3, dst=4, cost=1)]
+
+    # act
+    result = MSTSolver().solve(edges)
+
+    # assert
+    assert_equals([True, True], result)
+
+def test_union_find():
+    # arrange
+    sets = UnionFind(4)
+
+    # act
+    merged = sets.union(0, 1)
+    merged_again = sets.union(1, 0)
+    sets.union(2, 3)
+    sets.reset(2)
+
+    # assert
+    assert_true(merged)
+    assert_true(not merged_again)
+    assert_equals(2, sets.size)
+    assert_equals(4, len(sets.parent))
+    assert_true(sets.find(0) != sets.find(1))
+
+def test_dynamic_delete_many():
+    # arrange
+    mst = DynamicMST()
+    edges = []
+    for curedge in [(1, 'A', 'B'), (5, 'A', 'C'), (3, 'A', 'D'), (4, 'B', 'C'), (2, 'B', 'D'), (1, 'C', 'D')]:
+        edges.append(Link(src=curedge[1], dst=curedge[2], cost=curedge[0]))
+    for edge in edges:
+        mst.insert(edge)
+
+    # act
+    added, removed = mst.delete_many([edges[0], edges[4]])
+
+    # assert
+    assert_equals(set([edges[0], edges[4]]), set(removed))
+    assert_equals(set([edges[2], edges[3]]), set(added))
+    assert_equals(set(perform(edges[1:4] + edges[5:])), mst.tree_edges())
+
+def _random_edges(rand, vertices, count):
+    edges = []
+    pairs = set()
+    while len(edges) < count:
+        src, dst = rand.sample(range(vertices), 2)
+        if (src, dst) in pairs or (dst, src) in pairs:
+            continue
+        pairs.add((src, dst))
+        edges.append(Link(src=src, dst=dst, src_port=len(edges), dst_port=len(edges), cost=rand.randint(1, 10)))
+    return edges
+
+def test_algorithms_agree():
+    # arrange
+    rand = random.Random(7)
+    graphs = [_random_edges(rand, 30, count) for count in (10, 40, 120, 300)]
+
+    for edges in graphs:
+        # act
+        expected = MSTSolver().perform(edges)
+        results = dict((name, get_solver(name).perform(edges)) for name in ALGORITHMS)
+
+        # assert
+        for name, result in results.items():
+            assert_equals(expected, result)
+
+def test_prim_execution():
+    # arrange
+    edges = []
+    for curedge in [(1, 'A', 'B'), (5, 'A', 'C'), (3, 'A', 'D'), (4, 'B', 'C'), (2, 'B', 'D'), (1, 'C', 'D')]:
+        edges.append(Link(src=curedge[1], dst=curedge[2], cost=curedge[0]))
+
+    # act
+    result = prim.perform(edges)
+
+    # assert
+    assert_equals([edges[0], edges[4], edges[5]], result)
+
+def test_boruvka_forest():
+    # arrange
+    edges = [Link(src=1, dst=2, cost=3), Link(src=3, dst=4, cost=1), Link(src=4, dst=5, cost=2), Link(src=3, dst=5, cost=1)]
+
+    # act
+    result = boruvka.perform(edges)
+
+    # assert
+    assert_equals([edges[0], edges[1], edges[3]], result)
+
+@raises(ValueError)
+def test_unknown_algorithm():
+    # act
+    get_solver('unknown')
+
+def test_vectorized_mask():
+    if vectorized.numpy is None:
+        raise SkipTest('NumPy not available')
+
+    # arrange
+    sources = [0, 0, 0, 1, 1, 2]
+    destinations = [1, 2, 3, 2, 3, 3]
+    costs = [1, 5, 3, 4, 2, 1]
+
+    # act
+    result = vectorized.minimum_spanning_mask(sources, destinations, costs)
+
+    # assert
+    assert_equals([True, False, False, False, True, True], result.tolist())
+
+def test_vectorized_execution():
+    if vectorized.numpy is None:
+        raise SkipTest('NumPy not available')
+
+    # arrange
+    rand = random.Random(11)
+    edges = _random_edges(rand, 50, 400) + [Link(src=60, dst=61, cost=1), Link(src=60, dst=60, cost=0)]
+
+    # act
+    result = vectorized.perform(edges)
+
+    # assert
+    assert_equals(MSTSolver().perform(edges), result)
+
+def test_split_components():
+    # arrange
+    edges = [Link(src=1, dst=2, cost=1), Link(src=3, dst=4, cost=1), Link(src=2, dst=5, cost=1)]
+
+    # act
+    result = split_components(edges)
+
+    # assert
+    assert_equals([[0, 2], [1]], sorted(result))
+
+def test_component_solver():
+    # arrange
+    rand = random.Random(3)
+    pods = []
+    for pod in range(4):
+        pod_edges = _random_edges(rand, 10, 25)
+        pods.append([Link(src=(pod, edge.src), dst=(pod, edge.dst), src_port=edge.src_port, dst_port=edge.dst_port, cost=edge.cost) for edge in pod_edges])
+    edges = [edge for pod_edges in pods for edge in pod_edges]
+    solver = get_solver('kruskal', split_components=True)
+    observed = COMPONENT_SOLVE_TIME.count('100')
+
+    # act
+    result = solver.perform(edges)
+    pods[2][0] = pods[2][0].with_cost(100)
+    edges = [edge for pod_edges in pods for edge in pod_edges]
+    result_changed = solver.perform(edges)
+
+    # assert
+    assert_equals(36, len(result))
+    assert_equals(MSTSolver().perform(edges), result_changed)
+    assert_equals(4, len(solver.timings))
+    assert_equals(3, len([timing for timing in solver.timings if timing['cached']]))
+    assert_equals(observed + 5, COMPONENT_SOLVE_TIME.count('100'))
+    assert_equals(['10', '10', '100', '1000'], [size_class(edges) for edges in (0, 9, 10, 250)])
+
+def test_component_solver_workers():
+    # arrange
+    edges = [Link(src=1, dst=2, cost=1), Link(src=2, dst=3, cost=2), Link(src=1, dst=3, cost=3),
+             Link(src=4, dst=5, cost=1), Link(src=5, dst=6, cost=2), Link(src=4, dst=6, cost=1)]
+    solver = ComponentSolver(MSTSolver, workers=2)
+
+    # act
+    try:
+        result = solver.perform(edges)
+    finally:
+        solver.close()
+
+    # assert
+    assert_equals([edges[0], edges[1], edges[3], edges[5]], result)
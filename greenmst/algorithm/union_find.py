@@ -0,0 +1,64 @@
+# Copyright (C) 2014 Andrea Biancini <andrea.biancini@gmail.com>.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+__author__ = 'Andrea Biancini <andrea.biancini@gmail.com>'
+
+"""
+Array-backed disjoint sets over the dense indices 0..size-1.
+"""
+
+class UnionFind(object):
+    def __init__(self, size=0):
+        self.parent = []
+        self.rank = []
+        self.size = 0
+        self.reset(size)
+
+    def reset(self, size):
+        # The arrays only ever grow, so a reused instance does not reallocate
+        grow = size - len(self.parent)
+        if grow > 0:
+            self.parent.extend([0] * grow)
+            self.rank.extend([0] * grow)
+
+        parent = self.parent
+        rank = self.rank
+        for index in range(size):
+            parent[index] = index
+            rank[index] = 0
+        self.size = size
+
+    def find(self, index):
+        parent = self.parent
+        while parent[index] != index:
+            # Path halving keeps the trees flat without recursion
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+        return index
+
+    def union(self, index1, index2):
+        root1 = self.find(index1)
+        root2 = self.find(index2)
+        if root1 == root2:
+            return False
+
+        rank = self.rank
+        if rank[root1] > rank[root2]:
+            self.parent[root2] = root1
+        else:
+            self.parent[root1] = root2
+            if rank[root1] == rank[root2]:
+                rank[root2] += 1
+        return True
@@ -0,0 +1,91 @@
+# Copyright (C) 2014 Andrea Biancini <andrea.biancini@gmail.com>.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+__author__ = 'Andrea Biancini <andrea.biancini@gmail.com>'
+
+"""
+Kruskal's algorithm over parallel NumPy arrays (source index, destination
+index, cost), for topologies with many thousands of switches. NumPy is
+optional: this solver is only registered when it can be imported.
+"""
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from kruskal import MSTSolver, SOLVE_TIME
+
+def minimum_spanning_mask(sources, destinations, costs, vertices=None):
+    sources = numpy.asarray(sources, dtype=numpy.intp)
+    destinations = numpy.asarray(destinations, dtype=numpy.intp)
+    costs = numpy.asarray(costs)
+    in_tree = numpy.zeros(len(costs), dtype=bool)
+    if not len(costs):
+        return in_tree
+    if vertices is None:
+        vertices = int(max(sources.max(), destinations.max())) + 1
+
+    # A stable sort breaks ties on the position in the input, as in Kruskal
+    order = numpy.argsort(costs, kind='mergesort')
+    order = order[sources[order] != destinations[order]]
+
+    parent = list(range(vertices))
+    rank = [0] * vertices
+    chosen = []
+    remaining = vertices - 1
+    for position, src, dst in zip(order.tolist(), sources[order].tolist(), destinations[order].tolist()):
+        while parent[src] != src:
+            parent[src] = parent[parent[src]]
+            src = parent[src]
+        while parent[dst] != dst:
+            parent[dst] = parent[parent[dst]]
+            dst = parent[dst]
+        if src == dst:
+            continue
+
+        if rank[src] > rank[dst]:
+            parent[dst] = src
+        else:
+            parent[src] = dst
+            if rank[src] == rank[dst]:
+                rank[dst] += 1
+        chosen.append(position)
+        remaining -= 1
+        if not remaining:
+            break
+
+    in_tree[chosen] = True
+    return in_tree
+
+class VectorizedSolver(MSTSolver):
+    def solve(self, topo_edges):
+        topo_edges = list(topo_edges)
+        if not topo_edges:
+            return numpy.zeros(0, dtype=bool)
+
+        endpoints = numpy.array([edge.src for edge in topo_edges] + [edge.dst for edge in topo_edges])
+        vertices, indices = numpy.unique(endpoints, return_inverse=True)
+        costs = numpy.array([edge.cost for edge in topo_edges])
+        return minimum_spanning_mask(indices[:len(topo_edges)], indices[len(topo_edges):], costs, len(vertices))
+
+    def perform(self, topo_edges):
+        with SOLVE_TIME.time(type(self).__name__):
+            topo_edges = list(topo_edges)
+            in_tree = self.solve(topo_edges)
+            return [topo_edges[position] for position in numpy.flatnonzero(in_tree)]
+
+def perform(topo_edges):
+    return VectorizedSolver().perform(topo_edges)
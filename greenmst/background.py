@@ -0,0 +1,86 @@
+# Copyright (C) 2014 Andrea Biancini <andrea.biancini@gmail.com>.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+__author__ = 'Andrea Biancini <andrea.biancini@gmail.com>'
+
+"""
+Computes the MST outside of the ryu event loop. The topology is copied
+before every computation and a result is applied only if no newer change
+has been made to the topology in the meantime.
+"""
+
+import time
+from ryu.lib import hub
+
+if hub.HUB_TYPE == 'eventlet':
+    from eventlet import tpool
+else:
+    tpool = None
+
+class BackgroundSolver(object):
+    def __init__(self, solve, snapshot, apply_tree, threaded=True):
+        self.solve = solve
+        self.snapshot = snapshot
+        self.apply_tree = apply_tree
+        self.threaded = threaded and tpool is not None
+        self.thread = None
+        self.requested = False
+
+        self.computations = 0
+        self.stale_results = 0
+        self.last_duration = 0.0
+
+    @property
+    def running(self):
+        return self.thread is not None
+
+    def request(self):
+        self.requested = True
+        if self.thread is None:
+            self.thread = hub.spawn(self._run)
+
+    def execute(self, edges):
+        # Native threads keep the event loop serving packet-ins and REST
+        # calls while the tree is computed
+        if self.threaded:
+            return tpool.execute(self.solve, edges)
+        return self.solve(edges)
+
+    def _run(self):
+        try:
+            while self.requested:
+                self.requested = False
+                version, edges = self.snapshot()
+
+                start = time.time()
+                mst_edges = self.execute(edges)
+                self.last_duration = time.time() - start
+                self.computations += 1
+
+                if not self.apply_tree(version, mst_edges, start):
+                    # The topology changed while computing: start over on
+                    # the latest version and throw this result away
+                    self.stale_results += 1
+                    self.requested = True
+        finally:
+            self.thread = None
+
+    def stats(self):
+        return {
+            'computations': self.computations,
+            'staleResults': self.stale_results,
+            'running': self.running,
+            'lastDuration': self.last_duration
+        }
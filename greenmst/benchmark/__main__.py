@@ -0,0 +1,60 @@
+# Copyright (C) 2014 Andrea Biancini <andrea.biancini@gmail.com>.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+__author__ = 'Andrea Biancini <andrea.biancini@gmail.com>'
+
+"""
+Command line of the benchmark suite: python -m greenmst.benchmark --help
+"""
+
+import argparse
+import json
+import sys
+
+from . import suite, topologies
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarks GreenMST on synthetic topologies.')
+    parser.add_argument('--size', choices=sorted(topologies.SIZES), default='small')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--topology', action='append', choices=sorted(topologies.GENERATORS),
+                        help='topology to run, can be repeated (default: all)')
+    parser.add_argument('--benchmark', action='append',
+                        help='benchmark to run, can be repeated (default: all)')
+    parser.add_argument('--output', help='file the JSON results are written to (default: stdout)')
+    parser.add_argument('--compare', help='JSON results of a previous run to compare with')
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='slowdown of the median reported as a regression')
+    options = parser.parse_args(argv)
+
+    results = suite.run(options.size, options.repeat, options.topology, options.seed, options.benchmark)
+    output = json.dumps(results, indent=2, sort_keys=True)
+    if options.output:
+        with open(options.output, 'w') as output_file:
+            output_file.write(output + '\n')
+    else:
+        print(output)
+
+    if options.compare:
+        with open(options.compare) as baseline_file:
+            regressions = suite.compare(json.load(baseline_file), results, options.threshold)
+        for regression in regressions:
+            sys.stderr.write('%(topology)s %(benchmark)s: %(baseline).6fs -> %(median).6fs (x%(ratio).2f)\n' % regression)
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
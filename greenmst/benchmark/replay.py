@@ -0,0 +1,258 @@
+# Copyright (C) 2014 Andrea Biancini <andrea.biancini@gmail.com>.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+__author__ = 'Andrea Biancini <andrea.biancini@gmail.com>'
+
+"""
+Offline replay of topology events. Link additions, deletions and cost
+changes, recorded or synthetic, are fed to the Controller handlers, while
+in-process datapaths record the PortMods sent and answer the barriers.
+Usage: python -m greenmst.benchmark.replay --help
+
+The replay resets the (process wide) topology costs.
+"""
+
+import argparse
+import json
+import random
+import sys
+from collections import namedtuple
+from timeit import default_timer
+
+from ryu.ofproto import ofproto_v1_0, ofproto_v1_0_parser
+
+from ..controller import Controller
+from ..topology_costs import TopologyCosts
+from ..algorithm import kruskal
+from . import topologies
+from .suite import summarize
+
+Switch = namedtuple('Switch', 'dp ports')
+Port = namedtuple('Port', 'dpid port_no hw_addr')
+BarrierReply = namedtuple('BarrierReply', 'datapath xid')
+Event = namedtuple('Event', 'link switch msg')
+
+class ReplayLink(object):
+    def __init__(self, src, src_port, dst, dst_port):
+        self.endpoints = {
+            'src': { 'dpid': src, 'port_no': src_port },
+            'dst': { 'dpid': dst, 'port_no': dst_port }
+        }
+
+    def to_dict(self):
+        return self.endpoints
+
+class RecordingDatapath(object):
+    ofproto = ofproto_v1_0
+    ofproto_parser = ofproto_v1_0_parser
+
+    def __init__(self, dpid):
+        self.id = dpid
+        self.xid = 0
+        self.port_mods = []
+        self.barriers = []
+
+    def set_xid(self, msg):
+        self.xid += 1
+        msg.set_xid(self.xid)
+        return self.xid
+
+    def send_msg(self, msg):
+        if isinstance(msg, ofproto_v1_0_parser.OFPPortMod):
+            self.port_mods.append(msg)
+        elif isinstance(msg, ofproto_v1_0_parser.OFPBarrierRequest):
+            self.barriers.append(msg.xid)
+
+def hw_addr(dpid, port_no):
+    return '02:%02x:%02x:%02x:%02x:%02x' % ((dpid >> 16) & 0xff, (dpid >> 8) & 0xff, dpid & 0xff,
+                                             (port_no >> 8) & 0xff, port_no & 0xff)
+
+def _link_event(name, link):
+    return {'event': name, 'src': link.src, 'srcPort': link.src_port, 'dst': link.dst, 'dstPort': link.dst_port}
+
+def storm_events(links, count, seed=0):
+    # All the links are added in random order, then count random deletions,
+    # re-additions and cost changes follow
+    generator = random.Random(seed)
+    events = [_link_event('link_add', link) for link in generator.sample(links, len(links))]
+
+    present = set(range(len(links)))
+    for _ in range(count):
+        position = generator.randrange(len(links))
+        link = links[position]
+        if position not in present:
+            events.append(_link_event('link_add', link))
+            present.add(position)
+        elif generator.random() < 0.5:
+            events.append(_link_event('link_delete', link))
+            present.discard(position)
+        else:
+            events.append({'event': 'cost', 'src': link.src, 'dst': link.dst, 'cost': generator.randint(1, 10)})
+    return events
+
+class ReplayHarness(object):
+    def __init__(self, controller=None):
+        self.controller = controller if controller is not None else Controller()
+        self.datapaths = {}
+
+    def load_topology(self, links, events=()):
+        # Costs and switches (with the ports of the links) are known before
+        # any link is discovered, as with a live switches app
+        costs = TopologyCosts()
+        costs.costs = {}
+        ports = {}
+        for link in links:
+            costs.set_cost(link.src, link.dst, link.cost)
+            ports.setdefault(link.src, set()).add(link.src_port)
+            ports.setdefault(link.dst, set()).add(link.dst_port)
+        for event in events:
+            if 'srcPort' in event:
+                ports.setdefault(event['src'], set()).add(event['srcPort'])
+                ports.setdefault(event['dst'], set()).add(event['dstPort'])
+
+        for dpid, port_numbers in sorted(ports.items()):
+            datapath = self.datapaths[dpid] = RecordingDatapath(dpid)
+            switch_ports = [Port(dpid, port_no, hw_addr(dpid, port_no)) for port_no in sorted(port_numbers)]
+            self.controller._event_switch_enter_handler(Event(None, Switch(datapath, switch_ports), None))
+
+    def apply(self, event):
+        name = event['event']
+        if name == 'cost':
+            self.controller.update_costs([(event['src'], event['dst'], event['cost'])])
+            return
+
+        link = ReplayLink(event['src'], event['srcPort'], event['dst'], event['dstPort'])
+        if name == 'link_add':
+            self.controller._event_link_add_handler(Event(link, None, None))
+        elif name == 'link_delete':
+            self.controller._event_link_delete_handler(Event(link, None, None))
+        else:
+            raise ValueError('Unknown event %s.' % name)
+
+    def answer_barriers(self):
+        for datapath in self.datapaths.values():
+            barriers, datapath.barriers = datapath.barriers, []
+            for xid in barriers:
+                self.controller._barrier_reply_handler(Event(None, None, BarrierReply(datapath, xid)))
+
+    def port_mods(self):
+        return sum(len(datapath.port_mods) for datapath in self.datapaths.values())
+
+    def replay(self, events, per_event=False, batch=1):
+        # With a batch larger than one, the changes of that many events are
+        # coalesced into a single MST update, as a coalescing window would
+        latencies = []
+        details = []
+        stable_event = None
+        stable_time = 0.0
+        version = self.controller.changes.version
+        coalescer = self.controller.coalescer
+        coalescer.window = 0 if batch <= 1 else 60
+        coalescer.max_events = batch if batch > 1 else 0
+
+        start = default_timer()
+        for position, event in enumerate(events):
+            port_mods = self.port_mods()
+            event_start = default_timer()
+            self.apply(event)
+            if position + 1 == len(events):
+                coalescer.flush()
+            self.answer_barriers()
+            event_end = default_timer()
+            latencies.append(event_end - event_start)
+
+            # The tree is stable from the last event that changed it
+            if self.controller.changes.version != version:
+                version = self.controller.changes.version
+                stable_event = position
+                stable_time = event_end - start
+            if per_event:
+                details.append({'event': event['event'], 'latency': event_end - event_start,
+                                'portMods': self.port_mods() - port_mods})
+        total = default_timer() - start
+
+        latency = None
+        if latencies:
+            ordered = sorted(latencies)
+            latency = summarize(ordered)
+            latency['count'] = latency.pop('repeat')
+            latency['p95'] = ordered[int(0.95 * (len(ordered) - 1))]
+            latency['p99'] = ordered[int(0.99 * (len(ordered) - 1))]
+
+        report = {
+            'events': len(events),
+            'portMods': self.port_mods(),
+            'totalTime': total,
+            'latency': latency,
+            'timeToStableTree': stable_time,
+            'eventsToStableTree': stable_event + 1 if stable_event is not None else 0,
+            'links': len(self.controller.topo_edges),
+            'mstEdges': len(self.controller.mst_edges),
+            'consistent': self.consistent()
+        }
+        if per_event:
+            report['perEvent'] = details
+        return report
+
+    def consistent(self):
+        # The incrementally maintained tree must weigh as a full recompute
+        expected = kruskal.perform(self.controller.topo_edges)
+        mst_edges = self.controller.mst_edges
+        return (len(expected) == len(mst_edges) and
+                sum(link.cost for link in expected) == sum(link.cost for link in mst_edges))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replays topology events on an offline GreenMST controller.')
+    parser.add_argument('--topology', choices=sorted(topologies.GENERATORS), default='fat-tree')
+    parser.add_argument('--arguments', type=float, nargs='+', default=[8],
+                        help='arguments of the topology generator (default: 8)')
+    parser.add_argument('--events', type=int, default=1000, help='synthetic events after the initial discovery')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--input', help='JSON lines file of recorded events to replay instead')
+    parser.add_argument('--record', help='file the replayed events are written to, as JSON lines')
+    parser.add_argument('--output', help='file the JSON report is written to (default: stdout)')
+    parser.add_argument('--batch', type=int, default=1, help='events coalesced into a single MST update')
+    parser.add_argument('--per-event', action='store_true', help='include the latency of every event')
+    options = parser.parse_args(argv)
+
+    arguments = [int(value) if value == int(value) else value for value in options.arguments]
+    links = topologies.generate(options.topology, arguments, options.seed)
+    if options.input:
+        with open(options.input) as input_file:
+            events = [json.loads(line) for line in input_file if line.strip()]
+    else:
+        events = storm_events(links, options.events, options.seed)
+
+    if options.record:
+        with open(options.record, 'w') as record_file:
+            for event in events:
+                record_file.write(json.dumps(event, sort_keys=True) + '\n')
+
+    harness = ReplayHarness()
+    harness.load_topology(links, events)
+    report = harness.replay(events, options.per_event, options.batch)
+    report['topology'] = options.topology
+    report['arguments'] = arguments
+
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if options.output:
+        with open(options.output, 'w') as output_file:
+            output_file.write(output + '\n')
+    else:
+        print(output)
+    return 0 if report['consistent'] else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,133 @@
+# Copyright (C) 2014 Andrea Biancini <andrea.biancini@gmail.com>.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+__author__ = 'Andrea Biancini <andrea.biancini@gmail.com>'
+
+"""
+Times the MST computation, the full controller update, the search of the
+redundant edges and the REST serialization on synthetic topologies, and
+compares the results with a previous run.
+"""
+
+import json
+import platform
+import time
+from timeit import default_timer
+
+from ..algorithm import kruskal
+from ..controller import Controller
+from ..rest.encoder import LinkEncoder
+from ..snapshot import TopologySnapshot
+import topologies
+
+FORMAT_VERSION = 1
+
+def measure(function, repeat=5, setup=None):
+    # Returns the timings in seconds of the calls of function, each one
+    # passed the value returned by setup (called outside of the timing)
+    timings = []
+    for _ in range(repeat):
+        argument = setup() if setup is not None else None
+        start = default_timer()
+        function(argument)
+        timings.append(default_timer() - start)
+    return timings
+
+def summarize(timings):
+    ordered = sorted(timings)
+    middle = len(ordered) // 2
+    median = ordered[middle] if len(ordered) % 2 else (ordered[middle - 1] + ordered[middle]) / 2.0
+    return {
+        'repeat': len(ordered),
+        'min': ordered[0],
+        'max': ordered[-1],
+        'mean': sum(ordered) / len(ordered),
+        'median': median
+    }
+
+def new_controller(links):
+    controller = Controller()
+    # PortMods are not sent anywhere, but their ports are marked as applied
+    controller.mod_port = lambda switch_id, port_num, open: True
+    controller.topo_edges = links
+    return controller
+
+def solved_controller(links):
+    controller = new_controller(links)
+    controller.update_links()
+    return controller
+
+def benchmarks(links):
+    mst_edges = set(kruskal.perform(links))
+    return [
+        ('kruskal', lambda _: kruskal.perform(links), None),
+        ('update_links', lambda controller: controller.update_links(), lambda: new_controller(links)),
+        ('find_redundant_edges', lambda controller: controller.find_redundant_edges(mst_edges),
+         lambda: solved_controller(links)),
+        ('rest_encoder', lambda _: json.dumps(links, cls=LinkEncoder), None),
+        ('rest_snapshot', lambda _: TopologySnapshot(1, None, links, mst_edges, (), {}).body('topoedges'), None),
+    ]
+
+def run(size='small', repeat=5, names=None, seed=0, only=None):
+    results = []
+    for name, args in topologies.SIZES[size]:
+        if names and name not in names:
+            continue
+
+        links = topologies.generate(name, args, seed)
+        for benchmark, function, setup in benchmarks(links):
+            if only and benchmark not in only:
+                continue
+            result = summarize(measure(function, repeat, setup))
+            result.update({
+                'topology': name,
+                'arguments': list(args),
+                'switches': topologies.switches(links),
+                'links': len(links),
+                'benchmark': benchmark
+            })
+            results.append(result)
+
+    return {
+        'formatVersion': FORMAT_VERSION,
+        'timestamp': time.time(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'size': size,
+        'seed': seed,
+        'results': results
+    }
+
+def compare(baseline, current, threshold=1.25):
+    # Benchmarks whose median got slower than threshold times the baseline
+    reference = {}
+    for result in baseline['results']:
+        reference[(result['topology'], result['benchmark'])] = result
+
+    regressions = []
+    for result in current['results']:
+        previous = reference.get((result['topology'], result['benchmark']))
+        if previous is None or previous['links'] != result['links'] or not previous['median']:
+            continue
+        ratio = result['median'] / previous['median']
+        if ratio > threshold:
+            regressions.append({
+                'topology': result['topology'],
+                'benchmark': result['benchmark'],
+                'baseline': previous['median'],
+                'median': result['median'],
+                'ratio': ratio
+            })
+    return regressions
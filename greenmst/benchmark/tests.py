@@ -0,0 +1,155 @@
+# Copyright (C) 2014 Andrea Biancini <andrea.biancini@gmail.com>.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+__author__ = 'Andrea Biancini <andrea.biancini@gmail.com>'
+
+from nose.tools import assert_equals, assert_true
+from topologies import fat_tree, leaf_spine, torus, random_geometric, full_mesh, switches
+import suite
+from replay import ReplayHarness, storm_events
+
+def _check_ports(links):
+    # Every port is used by a single link
+    endpoints = set()
+    for link in links:
+        for endpoint in link.key:
+            assert_true(endpoint not in endpoints)
+            endpoints.add(endpoint)
+
+def test_fat_tree():
+    # act
+    links = fat_tree(4)
+
+    # assert
+    assert_equals(20, switches(links))
+    assert_equals(32, len(links))
+    _check_ports(links)
+
+def test_leaf_spine():
+    # act
+    links = leaf_spine(6, 2)
+
+    # assert
+    assert_equals(8, switches(links))
+    assert_equals(12, len(links))
+    _check_ports(links)
+
+def test_torus():
+    # act
+    links = torus(3, 4)
+    small = torus(2, 2)
+
+    # assert
+    assert_equals(12, switches(links))
+    assert_equals(24, len(links))
+    assert_equals(4, len(small))
+    _check_ports(links)
+
+def test_full_mesh():
+    # act
+    links = full_mesh(5)
+
+    # assert
+    assert_equals(5, switches(links))
+    assert_equals(10, len(links))
+    _check_ports(links)
+
+def test_random_geometric_reproducible():
+    # act
+    links = random_geometric(100, 0.2, seed=3)
+    again = random_geometric(100, 0.2, seed=3)
+    everything = random_geometric(20, 1.5, seed=3)
+
+    # assert
+    assert_equals([(link.key, link.cost) for link in links], [(link.key, link.cost) for link in again])
+    assert_equals(190, len(everything))
+    _check_ports(links)
+
+def test_run():
+    # act
+    results = suite.run('small', repeat=1, names=['torus'], only=['kruskal', 'update_links'])
+
+    # assert
+    assert_equals(1, results['formatVersion'])
+    assert_equals(['kruskal', 'update_links'], [result['benchmark'] for result in results['results']])
+    for result in results['results']:
+        assert_equals('torus', result['topology'])
+        assert_equals(100, result['switches'])
+        assert_equals(200, result['links'])
+        assert_true(result['median'] >= 0)
+
+def test_compare():
+    # arrange
+    baseline = {'results': [
+        {'topology': 'torus', 'benchmark': 'kruskal', 'links': 200, 'median': 1.0},
+        {'topology': 'torus', 'benchmark': 'update_links', 'links': 200, 'median': 1.0},
+    ]}
+    current = {'results': [
+        {'topology': 'torus', 'benchmark': 'kruskal', 'links': 200, 'median': 1.1},
+        {'topology': 'torus', 'benchmark': 'update_links', 'links': 200, 'median': 2.0},
+    ]}
+
+    # act
+    regressions = suite.compare(baseline, current, threshold=1.25)
+
+    # assert
+    assert_equals(1, len(regressions))
+    assert_equals('update_links', regressions[0]['benchmark'])
+    assert_equals(2.0, regressions[0]['ratio'])
+
+def test_storm_events():
+    # arrange
+    links = torus(3, 3)
+
+    # act
+    events = storm_events(links, 50, seed=1)
+
+    # assert
+    assert_equals(len(links) + 50, len(events))
+    assert_equals(set(['link_add']), set(event['event'] for event in events[:len(links)]))
+    assert_equals(events, storm_events(links, 50, seed=1))
+
+def test_replay():
+    # arrange
+    links = fat_tree(4)
+    events = storm_events(links, 100, seed=2)
+    harness = ReplayHarness()
+    harness.load_topology(links, events)
+
+    # act
+    report = harness.replay(events, per_event=True)
+
+    # assert
+    assert_true(report['consistent'])
+    assert_equals(len(events), report['events'])
+    assert_equals(len(events), report['latency']['count'])
+    assert_equals(sum(len(datapath.port_mods) for datapath in harness.datapaths.values()), report['portMods'])
+    assert_equals(report['portMods'], sum(detail['portMods'] for detail in report['perEvent']))
+    assert_true(0 < report['eventsToStableTree'] <= len(events))
+    assert_true(harness.controller.port_dispatcher.converged)
+
+def test_replay_batch():
+    # arrange
+    links = leaf_spine(6, 3)
+    events = storm_events(links, 40, seed=3)
+    harness = ReplayHarness()
+    harness.load_topology(links, events)
+
+    # act
+    report = harness.replay(events, batch=8)
+
+    # assert
+    assert_true(report['consistent'])
+    assert_true(harness.controller.coalescer.recomputes <= len(events) // 8 + 1)
@@ -0,0 +1,149 @@
+# Copyright (C) 2014 Andrea Biancini <andrea.biancini@gmail.com>.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+__author__ = 'Andrea Biancini <andrea.biancini@gmail.com>'
+
+"""
+Synthetic data center and mesh topologies, as lists of links. Switches get
+dpids from 1 and ports from 1 on each switch; link costs are drawn from a
+seeded generator, so the same arguments always give the same topology.
+"""
+
+import math
+import random
+
+from ..link import Link
+
+class TopologyBuilder(object):
+    def __init__(self, seed=0, max_cost=10):
+        self.random = random.Random(seed)
+        self.max_cost = max_cost
+        self.ports = {}
+        self.links = []
+
+    def add_link(self, src, dst):
+        src_port = self.ports[src] = self.ports.get(src, 0) + 1
+        dst_port = self.ports[dst] = self.ports.get(dst, 0) + 1
+        cost = self.random.randint(1, self.max_cost)
+        self.links.append(Link(src=src, src_port=src_port, dst=dst, dst_port=dst_port, cost=cost))
+
+def fat_tree(k, seed=0):
+    # k pods of k/2 edge and k/2 aggregation switches, (k/2)^2 core switches
+    half = k // 2
+    builder = TopologyBuilder(seed)
+    cores = range(1, half * half + 1)
+    next_dpid = len(cores) + 1
+    for pod in range(k):
+        aggregations = range(next_dpid, next_dpid + half)
+        edges = range(next_dpid + half, next_dpid + k)
+        next_dpid += k
+
+        for edge in edges:
+            for aggregation in aggregations:
+                builder.add_link(edge, aggregation)
+        for position, aggregation in enumerate(aggregations):
+            for core in cores[position * half:(position + 1) * half]:
+                builder.add_link(aggregation, core)
+    return builder.links
+
+def leaf_spine(leaves, spines, seed=0):
+    builder = TopologyBuilder(seed)
+    for leaf in range(spines + 1, spines + leaves + 1):
+        for spine in range(1, spines + 1):
+            builder.add_link(leaf, spine)
+    return builder.links
+
+def torus(rows, columns, seed=0):
+    builder = TopologyBuilder(seed)
+    dpid = lambda row, column: row * columns + column + 1
+    for row in range(rows):
+        for column in range(columns):
+            # Wrap-around links only when they do not duplicate a neighbour
+            if columns > 2 or column + 1 < columns:
+                builder.add_link(dpid(row, column), dpid(row, (column + 1) % columns))
+            if rows > 2 or row + 1 < rows:
+                builder.add_link(dpid(row, column), dpid((row + 1) % rows, column))
+    return builder.links
+
+def random_geometric(switches, radius, seed=0):
+    # Switches are points in the unit square, linked when closer than the
+    # radius; a grid of radius sized cells avoids comparing all the pairs
+    builder = TopologyBuilder(seed)
+    points = [(builder.random.random(), builder.random.random()) for _ in range(switches)]
+    cells = {}
+    for dpid, (x, y) in enumerate(points, 1):
+        cells.setdefault((int(x / radius), int(y / radius)), []).append(dpid)
+
+    for dpid, (x, y) in enumerate(points, 1):
+        cell_x, cell_y = int(x / radius), int(y / radius)
+        for near_x in (cell_x - 1, cell_x, cell_x + 1):
+            for near_y in (cell_y - 1, cell_y, cell_y + 1):
+                for other in cells.get((near_x, near_y), ()):
+                    if other <= dpid:
+                        continue
+                    other_x, other_y = points[other - 1]
+                    if math.hypot(x - other_x, y - other_y) <= radius:
+                        builder.add_link(dpid, other)
+    return builder.links
+
+def full_mesh(switches, seed=0):
+    builder = TopologyBuilder(seed)
+    for src in range(1, switches + 1):
+        for dst in range(src + 1, switches + 1):
+            builder.add_link(src, dst)
+    return builder.links
+
+GENERATORS = {
+    'fat-tree': fat_tree,
+    'leaf-spine': leaf_spine,
+    'torus': torus,
+    'random-geometric': random_geometric,
+    'full-mesh': full_mesh,
+}
+
+# Arguments of the generators for each benchmark size
+SIZES = {
+    'small': [
+        ('fat-tree', (8,)),
+        ('leaf-spine', (32, 8)),
+        ('torus', (10, 10)),
+        ('random-geometric', (200, 0.12)),
+        ('full-mesh', (30,)),
+    ],
+    'medium': [
+        ('fat-tree', (24,)),
+        ('leaf-spine', (512, 32)),
+        ('torus', (40, 40)),
+        ('random-geometric', (2000, 0.04)),
+        ('full-mesh', (100,)),
+    ],
+    'large': [
+        ('fat-tree', (48,)),
+        ('leaf-spine', (1024, 64)),
+        ('torus', (70, 70)),
+        ('random-geometric', (5000, 0.025)),
+        ('full-mesh', (200,)),
+    ],
+}
+
+def generate(name, args, seed=0):
+    return GENERATORS[name](*args, seed=seed)
+
+def switches(links):
+    dpids = set()
+    for link in links:
+        dpids.add(link.src)
+        dpids.add(link.dst)
+    return len(dpids)
@@ -0,0 +1,95 @@
+# Copyright (C) 2014 Andrea Biancini <andrea.biancini@gmail.com>.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+__author__ = 'Andrea Biancini <andrea.biancini@gmail.com>'
+
+"""
+Bounded history of the changes made to the MST, so that clients can fetch
+only what changed since the last version they have seen.
+"""
+
+import time
+from collections import deque
+from itertools import islice
+from ryu.lib import hub
+from dpid import format_dpid
+
+def _ports_json(ports):
+    return [{ 'switch': format_dpid(dpid), 'port': port_no } for dpid, port_no in ports]
+
+class ChangeEvent(object):
+    def __init__(self, version, added, removed, opened, closed, duration, timestamp=None):
+        self.version = version
+        self.added = tuple(added)
+        self.removed = tuple(removed)
+        self.opened = tuple(opened)
+        self.closed = tuple(closed)
+        self.duration = duration
+        self.timestamp = time.time() if timestamp is None else timestamp
+
+    def to_json(self):
+        return {
+            'version': self.version,
+            'timestamp': self.timestamp,
+            'duration': self.duration,
+            'addedEdges': [link.to_json() for link in self.added],
+            'removedEdges': [link.to_json() for link in self.removed],
+            'openedPorts': _ports_json(self.opened),
+            'closedPorts': _ports_json(self.closed)
+        }
+
+class ChangeLog(object):
+    def __init__(self, size=1024):
+        self.events = deque(maxlen=size)
+        self.version = 0
+        self.updated = hub.Event()
+
+    @property
+    def oldest(self):
+        # Oldest version still available, the first one a client can ask for
+        if not self.events:
+            return self.version + 1
+        return self.events[0].version
+
+    def record(self, added, removed, opened, closed, duration):
+        if not (added or removed or opened or closed):
+            return None
+
+        self.version += 1
+        event = ChangeEvent(self.version, added, removed, opened, closed, duration)
+        self.events.append(event)
+
+        # Wake up the long polling clients
+        updated, self.updated = self.updated, hub.Event()
+        updated.set()
+        return event
+
+    def since(self, version):
+        if version >= self.version:
+            return []
+        # Versions in the buffer are consecutive
+        start = max(0, version + 1 - self.oldest)
+        return list(islice(self.events, start, None))
+
+    def truncated(self, version):
+        # Events right after the given version were dropped from the buffer,
+        # or the version was never recorded (e.g. before a restart)
+        return version + 1 < self.oldest or version > self.version
+
+    def wait(self, version, timeout):
+        # Clients behind or ahead of the log are answered right away
+        if version != self.version:
+            return True
+        return self.updated.wait(timeout)
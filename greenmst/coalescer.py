@@ -0,0 +1,86 @@
+# Copyright (C) 2014 Andrea Biancini <andrea.biancini@gmail.com>.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+__author__ = 'Andrea Biancini <andrea.biancini@gmail.com>'
+
+"""
+Collects the links touched by topology events over a time window, so that
+a burst of events results in a single MST update.
+"""
+
+from ryu.lib import hub
+
+class EventCoalescer(object):
+    def __init__(self, apply_changes, window=0, max_events=0):
+        self.apply_changes = apply_changes
+        self.window = window
+        self.max_events = max_events
+        self.pending = {}
+        self.pending_events = 0
+        self.timer = None
+
+        self.recomputes = 0
+        self.coalesced_events = 0
+        self.last_batch = 0
+        self.max_batch = 0
+
+    @property
+    def enabled(self):
+        return self.window > 0
+
+    def add(self, links):
+        for link in links:
+            self.pending[link.key] = link
+        self.pending_events += 1
+
+        if not self.enabled or (self.max_events and self.pending_events >= self.max_events):
+            self.flush()
+        elif self.timer is None:
+            self.timer = hub.spawn_after(self.window, self._window_expired)
+
+    def _window_expired(self):
+        self.timer = None
+        self.flush()
+
+    def clear(self):
+        if self.timer is not None:
+            hub.kill(self.timer)
+            self.timer = None
+        self.pending = {}
+        self.pending_events = 0
+
+    def flush(self):
+        links = list(self.pending.values())
+        events = self.pending_events
+        self.clear()
+        if not events:
+            return
+
+        self.recomputes += 1
+        self.coalesced_events += events
+        self.last_batch = events
+        self.max_batch = max(self.max_batch, events)
+        self.apply_changes(links)
+
+    def stats(self):
+        mean = float(self.coalesced_events) / self.recomputes if self.recomputes else 0.0
+        return {
+            'recomputes': self.recomputes,
+            'events': self.coalesced_events,
+            'pending': self.pending_events,
+            'lastBatch': self.last_batch,
+            'maxBatch': self.max_batch,
+            'meanBatch': mean
+        }
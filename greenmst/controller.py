@@ -18,11 +18,59 @@ An OpenFlow 1.0 GreenMST loop free module.
 """
 __author__ = 'Andrea Biancini <andrea.biancini@gmail.com>'
 
+import time
+
+from ryu import cfg
+from ryu.lib import hub
 from ryu.topology import event, switches, api
+from ryu.controller import ofp_event
+from ryu.controller.handler import MAIN_DISPATCHER
 from ryu.controller.handler import set_ev_cls
 from topology_costs import TopologyCosts
 from simple_switch import SimpleSwitch
-from link import Link
+from link import Link, link_key
+from topology import TopologyIndex
+from coalescer import EventCoalescer
+from background import BackgroundSolver
+from snapshot import TopologySnapshot
+from change_log import ChangeLog
+from journal import TopologyJournal
+from metrics import registry, timed
+from port_dispatcher import PortModDispatcher
+from datapath_cache import DatapathCache
+from port_states import PortStateTable
+from algorithm.dynamic import DynamicMST
+import algorithm
+
+CONF = cfg.CONF
+CONF.register_opts([
+    cfg.StrOpt('greenmst_algorithm', default='kruskal',
+               help='algorithm used for full MST computations '
+                    '(%s)' % ', '.join(sorted(algorithm.ALGORITHMS))),
+    cfg.BoolOpt('greenmst_split_components', default=False,
+                help='compute the tree of each connected component separately'),
+    cfg.IntOpt('greenmst_workers', default=0,
+               help='worker processes used for the components trees '
+                    '(0 computes them in the controller process)'),
+    cfg.BoolOpt('greenmst_background', default=False,
+                help='compute the MST in a background thread, outside of '
+                     'the event loop'),
+    cfg.StrOpt('greenmst_journal_dir', default='',
+               help='directory of the journal the topology is restored from '
+                    'on restart (empty disables the journal)')
+])
+
+TOPOLOGY_EVENTS = registry.counter('greenmst_topology_events_total', 'Topology events received', 'event')
+PORT_MODS = registry.counter('greenmst_port_mods_total', 'PortMod messages sent', 'switch')
+UPDATE_LINKS_TIME = registry.histogram('greenmst_update_links_seconds', 'Time spent in full MST recomputations')
+APPLY_TREE_TIME = registry.histogram('greenmst_apply_tree_seconds', 'Time spent applying a computed MST to the ports')
+INCREMENTAL_UPDATE_TIME = registry.histogram('greenmst_incremental_update_seconds',
+                                             'Time spent applying topology changes to the MST')
+REDUNDANT_EDGES_TIME = registry.histogram('greenmst_find_redundant_edges_seconds',
+                                          'Time spent finding the edges not in the MST')
+MOD_PORT_TIME = registry.histogram('greenmst_mod_port_seconds', 'Time spent building and sending PortMods')
+RESTORE_TIME = registry.histogram('greenmst_restore_seconds', 'Time spent restoring the topology from the journal')
+TOPOLOGY_SIZE = registry.gauge('greenmst_edges', 'Number of edges known to the controller', 'set')
 
 class Controller(SimpleSwitch):
     _CONTEXTS = {
@@ -30,99 +78,425 @@ class Controller(SimpleSwitch):
     }
 
     close_port = False
+    # Seconds during which topology events are collected before updating
+    # the MST (0 updates on every event), and maximum events per update
+    coalesce_window = 0
+    coalesce_max_events = 0
+    # Batches of changes touching at least full_update_min_links links, and
+    # more than full_update_ratio of the topology, are applied recomputing
+    # the MST with the configured solver instead of updating it in place
+    full_update_min_links = 64
+    full_update_ratio = 0.5
+    # Number of MST changes kept for the clients polling the deltas
+    change_log_size = 1024
+    # Journal records between two snapshots, and seconds given to the
+    # discovery to confirm the restored links before they are removed
+    journal_snapshot_every = 1000
+    restore_grace = 30
 
     def __init__(self, *args, **kwargs):
         super(Controller, self).__init__(*args, **kwargs)
-        self.topo_edges = []
-        self.redundant_edges = []
-        self.mst_edges = []
+        self.topology = TopologyIndex()
+        self.redundant_edges = set()
+        self.mst_edges = set()
         self.topo_costs = TopologyCosts()
+        self.mst = DynamicMST()
+        self.mst_solver = algorithm.get_solver(CONF.greenmst_algorithm,
+                                               CONF.greenmst_split_components,
+                                               CONF.greenmst_workers)
+        self.port_dispatcher = PortModDispatcher()
+        self.datapaths = DatapathCache()
+        self.port_states = PortStateTable()
+        self.coalescer = EventCoalescer(self.apply_changes, self.coalesce_window, self.coalesce_max_events)
+        self.tree_version = 0
+        self.last_snapshot = None
+        self.changes = ChangeLog(self.change_log_size)
+        self.background = None
+        if CONF.greenmst_background:
+            self.background = BackgroundSolver(self.mst_solver.perform, self.topology_snapshot, self.apply_tree)
+        self.restored = set()
+        self.restore_timer = None
+        self.journal = None
+        if CONF.greenmst_journal_dir:
+            self.journal = TopologyJournal(CONF.greenmst_journal_dir, self.journal_snapshot_every)
+            self.restore()
 
     @property
     def topology_costs(self):
         return self.topo_costs.costs
 
+    @property
+    def topo_edges(self):
+        return self.topology.edges
+
+    @topo_edges.setter
+    def topo_edges(self, edges):
+        self.topology = TopologyIndex(edges, self.topology.version + 1)
+
+    def topology_snapshot(self):
+        return self.topology.snapshot()
+
+    def current_snapshot(self):
+        # A new snapshot is taken only when the topology, the tree or the
+        # costs changed since the last one
+        key = (self.topology.version, self.tree_version, self.topo_costs.version)
+        snapshot = self.last_snapshot
+        if snapshot is None or snapshot.key != key:
+            version = snapshot.version + 1 if snapshot is not None else 1
+            snapshot = TopologySnapshot(version, key, self.topo_edges, self.mst_edges,
+                                        self.redundant_edges, self.topology_costs)
+            self.last_snapshot = snapshot
+        return snapshot
+
     @set_ev_cls(event.EventLinkAdd)
     def _event_link_add_handler(self, ev):
+        TOPOLOGY_EVENTS.inc('link_add')
         link = Link(link=ev.link)
-        if link in self.topo_edges or link.link_inverse() in self.topo_edges:
+        if link in self.topology:
+            self.restored.discard(link.key)
             return
 
-        self.topo_edges.append(link)
+        evicted = self.topology.add(link)
         self.logger.debug('Link added: %s.', link)
-        self.update_links()
+        self.topology_changed(evicted + [link])
 
     @set_ev_cls(event.EventLinkDelete)
     def _event_link_delete_handler(self, ev):
-        link = Link(link=ev.link)
-        removed = False
+        TOPOLOGY_EVENTS.inc('link_delete')
+        link = self.topology.remove(link_key(*Link.endpoints(ev.link)))
+        if link is None:
+            return
+
+        self.logger.debug('Link removed: %s.', link)
+        self.topology_changed([link])
+
+    @set_ev_cls(event.EventPortAdd)
+    def _event_port_add_handler(self, ev):
+        TOPOLOGY_EVENTS.inc('port_add')
+        self.datapaths.add_port(ev.port)
+
+    @set_ev_cls(event.EventPortDelete)
+    def _event_port_delete_handler(self, ev):
+        TOPOLOGY_EVENTS.inc('port_delete')
+        self.datapaths.remove_port(ev.port)
+        self.port_down(ev.port.dpid, ev.port.port_no)
+
+    @set_ev_cls(event.EventPortModify)
+    def _event_port_modify_handler(self, ev):
+        TOPOLOGY_EVENTS.inc('port_modify')
+        self.datapaths.add_port(ev.port)
+        if ev.port.is_down():
+            self.port_down(ev.port.dpid, ev.port.port_no)
+
+    @set_ev_cls(event.EventSwitchEnter)
+    def _event_switch_enter_handler(self, ev):
+        TOPOLOGY_EVENTS.inc('switch_enter')
+        self.datapaths.add_switch(ev.switch)
+        # Ports closed before the switch (re)connected, as after a restore
+        self.port_states.touch_switch(ev.switch.dp.id)
+        self.reconcile_ports()
+
+    @set_ev_cls(event.EventSwitchLeave)
+    def _event_switch_leave_handler(self, ev):
+        TOPOLOGY_EVENTS.inc('switch_leave')
+        dpid = ev.switch.dp.id
+        self.datapaths.remove_switch(dpid)
+        self.port_states.forget_switch(dpid)
+        self.port_dispatcher.forget(dpid)
+        self.mac_to_port.pop(dpid, None)
+        links = self.topology.remove_switch(dpid)
+        if links:
+            self.logger.debug('Switch %s left, removing %s links.', dpid, len(links))
+            self.topology_changed(links)
+
+    @set_ev_cls(ofp_event.EventOFPBarrierReply, MAIN_DISPATCHER)
+    def _barrier_reply_handler(self, ev):
+        dpid = ev.msg.datapath.id
+        latency = self.port_dispatcher.confirm(dpid, ev.msg.xid)
+        if latency is None:
+            return
+
+        self.logger.debug('Switch %s confirmed ModPort commands in %.3f ms.', dpid, latency * 1000)
+        if self.port_dispatcher.converged:
+            self.logger.debug('Port configuration converged in %.3f ms.', self.port_dispatcher.last_convergence * 1000)
+
+    def port_down(self, dpid, port_no):
+        link = self.topology.get(dpid, port_no)
+        if link is None:
+            return
+        # Ports turned off by GreenMST itself do not mean the link is gone
+        if self.close_port and link in self.redundant_edges:
+            return
+
+        self.topology.remove(link.key)
+        self.logger.debug('Port %s on switch %s down, removing %s.', port_no, dpid, link)
+        self.topology_changed([link])
+
+    def topology_changed(self, links):
+        if self.journal is not None:
+            for link in links:
+                stored = self.topology.find(link.key)
+                if stored is not None:
+                    self.journal.add(stored)
+                else:
+                    self.journal.remove(link)
+            self.journal_written()
+        self.coalescer.add(links)
+
+    def journal_written(self):
+        if self.journal.due:
+            self.journal.compact(self.topo_edges, self.topo_costs.items())
+
+    def restore(self):
+        # The last known topology and tree are loaded right away, without
+        # sending any PortMod: the ports are configured as their switches
+        # connect, and the links not rediscovered in time are removed
+        start = time.time()
+        state = self.journal.load()
+        if state is None:
+            return False
+
+        links, costs = state
+        self.topo_costs.costs = {}
+        for source, destination, cost in costs:
+            self.topo_costs.set_cost(source, destination, cost)
+        self.topo_edges = links
+        self.restored = set(link.key for link in links)
+        self.load_tree(self.mst_solver.perform(self.topo_edges))
+        self.port_states.dirty.clear()
+        self.restore_timer = hub.spawn_after(self.restore_grace, self.expire_restored)
 
-        if link in self.topo_edges:
-            self.topo_edges.remove(link)
-            removed = True
-        if link.link_inverse() in self.topo_edges:
-            self.topo_edges.remove(link.link_inverse())
-            removed = True
+        duration = time.time() - start
+        RESTORE_TIME.observe(duration)
+        self.logger.info('Restored %s links and %s tree edges from the journal in %.3f ms.',
+                         len(self.topo_edges), len(self.mst_edges), duration * 1000)
+        return True
 
-        if removed:
-            self.logger.debug('Link removed: %s.', link)
+    def expire_restored(self):
+        self.restore_timer = None
+        links = [link for link in (self.topology.remove(key) for key in self.restored) if link is not None]
+        self.restored = set()
+        if links:
+            self.logger.info('Removing %s restored links not rediscovered.', len(links))
+            self.topology_changed(links)
+
+    def apply_changes(self, links):
+        if self.background is not None:
+            self.background.request()
+        elif len(links) >= self.full_update_min_links and len(links) > self.full_update_ratio * len(self.topology):
             self.update_links()
+        else:
+            self.update_incrementally(links)
+
+    @timed(INCREMENTAL_UPDATE_TIME)
+    def update_incrementally(self, links):
+        start = time.time()
+        # Links still in the topology were added (or re-added), the others
+        # were removed since the last update of the tree
+        present = []
+        deleted = []
+        for link in links:
+            stored = self.topology.find(link.key)
+            if stored is None:
+                deleted.append(link)
+            else:
+                present.append(stored)
+
+        touched = present + self.delete_edges(deleted)
+        for link in present:
+            added, removed = self.mst.insert(link)
+            touched.extend(added + removed)
+        self.update_edges(touched, start)
+
+    def delete_edges(self, links):
+        if not links:
+            return []
+
+        if len(links) == 1:
+            added, removed = self.mst.delete(links[0])
+        else:
+            added, removed = self.mst.delete_many(links)
+        return list(links) + added + removed
 
     def set_costs(self, new_costs):
-        topo_costs = TopologyCosts()
-        topo_costs.costs = new_costs
-        self.update_links()
+        pairs = set((source, destination) for source, destination, cost in self.topo_costs.items())
+        self.topo_costs.costs = new_costs
+        if self.journal is not None:
+            self.journal.costs(self.topo_costs.items())
+            self.journal_written()
+        pairs.update((source, destination) for source, destination, cost in self.topo_costs.items())
+        return self.recost_links(pairs)
+
+    def update_costs(self, changes):
+        pairs = set()
+        for source, destination, cost in changes:
+            self.topo_costs.set_cost(source, destination, cost)
+            pairs.add((min(source, destination), max(source, destination)))
+            if self.journal is not None:
+                self.journal.cost(source, destination, cost)
+        if self.journal is not None:
+            self.journal_written()
+        return self.recost_links(pairs)
+
+    def patch_costs(self, changes):
+        # All the links re-costed by the batch go through a single MST
+        # update, applied right away to report the resulting changes. In
+        # background mode the update is only requested: it is pending, and
+        # its changes are recorded after version
+        version = self.changes.version
+        links = self.update_costs(changes)
+        self.coalescer.flush()
+        pending = self.background is not None and bool(links)
+        return links, self.changes.since(version), version, pending
 
+    def recost_links(self, pairs):
+        # Re-cost the live links between the given switches in place and
+        # feed only the ones whose cost actually changed to the MST
+        changed = []
+        for source, destination in pairs:
+            cost = self.topo_costs.get_cost(source, destination)
+            for link in list(self.topology.links(source)):
+                peer = link.dst if link.src == source else link.src
+                if peer != destination or link.cost == cost:
+                    continue
+
+                updated = link.with_cost(cost)
+                self.topology.replace(updated)
+                changed.append(updated)
+
+        if changed:
+            self.logger.debug('Cost changed for links %s.', changed)
+            self.topology_changed(changed)
+        return changed
+
+    @timed(UPDATE_LINKS_TIME)
     def update_links(self):
         self.logger.debug('Updating MST because of topology change...')
-        old_redundant_edges = self.redundant_edges
+        # A full recompute supersedes any change still waiting to be applied
+        self.coalescer.clear()
+
+        if self.background is not None:
+            self.background.request()
+            return
+        start = time.time()
+        self.apply_tree(self.topology.version, self.mst_solver.perform(self.topo_edges), start)
+
+    @timed(APPLY_TREE_TIME)
+    def apply_tree(self, version, mst_edges, start=None):
+        if version != self.topology.version:
+            self.logger.debug('Dropping MST computed on topology version %s (now %s).', version, self.topology.version)
+            return False
+        if start is None:
+            start = time.time()
 
-        from algorithm import kruskal as algorithm
-        self.mst_edges = algorithm.perform(self.topo_edges)
+        previous = set(self.mst_edges)
+        self.load_tree(mst_edges)
+        ports = self.reconcile_ports()
+        # Edges still in the topology are reported with their current cost
+        removed = [self.topology.find(edge.key) or edge for edge in previous - self.mst_edges]
+        self.record_changes(self.mst_edges - previous, removed, ports, start)
+
+        self.logger.debug('New topoEdges = %s.', self.topo_edges)
+        self.logger.debug('New redundantEdges = %s.', self.redundant_edges)
+        return True
+
+    def load_tree(self, mst_edges):
+        self.mst_edges = set(mst_edges)
+        self.mst.load(self.topo_edges, self.mst_edges)
         self.logger.debug('mstEdges = %s', self.mst_edges)
 
-        new_redundant_edges = self.find_redundant_edges(self.mst_edges)
-        self.logger.debug('newRedundantEdges = %s.', new_redundant_edges)
+        self.redundant_edges = self.find_redundant_edges(self.mst_edges)
+        self.tree_version += 1
+        self.port_states.set_closed(self.redundant_edges)
 
-        if len(new_redundant_edges) == 0:
-            return
+    def update_edges(self, edges, start=None):
+        if start is None:
+            start = time.time()
 
-        # Close edges in redundantEdges
-        for edge in new_redundant_edges:
-            if not edge in old_redundant_edges:
-                self.logger.debug('Closing edge %s.', edge)
-                self.mod_port(edge.src, edge.src_port, False)
-                self.mod_port(edge.dst, edge.dst_port, False)
+        # Only the given edges can have changed state after an incremental
+        # MST update, so just their ports need to be reconfigured
+        added = []
+        removed = []
+        for edge in edges:
+            in_tree = edge in self.mst_edges
+            self.mst_edges.discard(edge)
+            self.redundant_edges.discard(edge)
 
-        # Re-open ports in MSP which were closed in previous iterations
-        # (ie edges in the redundantEdges, from previous execution, and not in the current execution)
-        for edge in old_redundant_edges:
-            if not edge in new_redundant_edges:
-                self.logger.debug('Opening edge %s.', edge)
-                self.mod_port(edge.src, edge.src_port, True)
-                self.mod_port(edge.dst, edge.dst_port, True)
+            tree_edge = self.mst.get(edge)
+            stored = self.topology.find(edge.key)
+            if tree_edge is not None:
+                self.mst_edges.add(tree_edge)
+                self.port_states.open(tree_edge)
+                if not in_tree:
+                    added.append(tree_edge)
+                continue
 
-        # Clone redundantEdges in redundantEdges for future iterations
-        self.redundant_edges = new_redundant_edges
+            if in_tree:
+                removed.append(edge)
+            if stored is not None:
+                self.redundant_edges.add(stored)
+                self.port_states.close(stored)
+            else:
+                self.port_states.open(edge)
+        self.tree_version += 1
+        ports = self.reconcile_ports()
+        self.record_changes(added, removed, ports, start)
 
-        self.logger.debug('New topoEdges = %s.', self.topo_edges)
+        self.logger.debug('mstEdges = %s', self.mst_edges)
         self.logger.debug('New redundantEdges = %s.', self.redundant_edges)
 
+    def reconcile_ports(self):
+        applied = []
+        with self.port_dispatcher.batch():
+            for (dpid, port_no), open in self.port_states.changes():
+                if self.mod_port(dpid, port_no, open):
+                    self.port_states.mark_applied((dpid, port_no), open)
+                    applied.append(((dpid, port_no), open))
+        return applied
+
+    def collect_metrics(self):
+        TOPOLOGY_SIZE.set(len(self.topology), 'topology')
+        TOPOLOGY_SIZE.set(len(self.mst_edges), 'mst')
+        TOPOLOGY_SIZE.set(len(self.redundant_edges), 'redundant')
+
+        metrics = registry.to_json()
+        metrics['coalescer'] = self.coalescer.stats()
+        metrics['portDispatcher'] = self.port_dispatcher.to_json()
+        metrics['macTable'] = self.mac_to_port.stats()
+        if self.background is not None:
+            metrics['background'] = self.background.stats()
+        return metrics
+
+    def record_changes(self, added, removed, ports, start):
+        opened = [endpoint for endpoint, open in ports if open]
+        closed = [endpoint for endpoint, open in ports if not open]
+        return self.changes.record(added, removed, opened, closed, time.time() - start)
+
+    @timed(REDUNDANT_EDGES_TIME)
     def find_redundant_edges(self, mst_edges):
-        redundant_edges = []
+        mst_edges = set(mst_edges)
+        return set(edge for edge in self.topo_edges if edge not in mst_edges)
 
-        for topo_edge in self.topo_edges:
-            if topo_edge not in mst_edges and topo_edge.link_inverse() not in mst_edges:
-                redundant_edges.append(topo_edge)
+    def lookup_port(self, switch_id, port_num):
+        entry = self.datapaths.lookup(switch_id, port_num)
+        if entry is not None:
+            return entry
 
-        return redundant_edges
+        # Ask the switches app only for switches not seen through the events
+        for switch in api.get_switch(self, switch_id):
+            self.datapaths.add_switch(switch)
+        return self.datapaths.lookup(switch_id, port_num)
 
+    @timed(MOD_PORT_TIME)
     def mod_port(self, switch_id, port_num, open):
-        switch = api.get_switch(self, switch_id)[0]
-        datapath = switch.dp
+        entry = self.lookup_port(switch_id, port_num)
+        if entry is None:
+            self.logger.info('Port %s on switch %s not known, skipping ModPort.', port_num, switch_id)
+            return
+
+        datapath, hw_addr = entry
         ofp = datapath.ofproto
         ofp_parser = datapath.ofproto_parser
-        hw_addr = switch.ports[port_num-1].hw_addr
         config = 0 if (open) else 63
         mask = ofp.OFPPC_PORT_DOWN if self.close_port else ofp.OFPPC_NO_FLOOD
         advertise = (ofp.OFPPF_10MB_HD | ofp.OFPPF_100MB_FD |
@@ -132,4 +506,6 @@ class Controller(SimpleSwitch):
 
         req = ofp_parser.OFPPortMod(datapath, port_num, hw_addr, config, mask, advertise)
         self.logger.info('Sending ModPort command to switch %s - %s port %s (hw address %s).', switch_id, "opening" if open else "closing", port_num, hw_addr)
-        datapath.send_msg(req)
+        self.port_dispatcher.send(datapath, req)
+        PORT_MODS.inc(switch_id)
+        return True
@@ -0,0 +1,55 @@
+# Copyright (C) 2014 Andrea Biancini <andrea.biancini@gmail.com>.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+__author__ = 'Andrea Biancini <andrea.biancini@gmail.com>'
+
+"""
+Local copy of the datapaths and port addresses known to the switches app,
+kept up to date from the topology events.
+"""
+
+class DatapathCache(object):
+    def __init__(self):
+        self.datapaths = {}
+        self.ports = {}
+        self.switch_ports = {}
+
+    def __contains__(self, dpid):
+        return dpid in self.datapaths
+
+    def add_switch(self, switch):
+        self.datapaths[switch.dp.id] = switch.dp
+        for port in switch.ports:
+            self.add_port(port)
+
+    def remove_switch(self, dpid):
+        self.datapaths.pop(dpid, None)
+        for port_no in self.switch_ports.pop(dpid, ()):
+            del self.ports[(dpid, port_no)]
+
+    def add_port(self, port):
+        self.ports[(port.dpid, port.port_no)] = port.hw_addr
+        self.switch_ports.setdefault(port.dpid, set()).add(port.port_no)
+
+    def remove_port(self, port):
+        if self.ports.pop((port.dpid, port.port_no), None) is not None:
+            self.switch_ports[port.dpid].discard(port.port_no)
+
+    def lookup(self, dpid, port_no):
+        datapath = self.datapaths.get(dpid)
+        hw_addr = self.ports.get((dpid, port_no))
+        if datapath is None or hw_addr is None:
+            return None
+        return datapath, hw_addr
@@ -0,0 +1,49 @@
+# Copyright (C) 2014 Andrea Biancini <andrea.biancini@gmail.com>.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+__author__ = 'Andrea Biancini <andrea.biancini@gmail.com>'
+
+"""
+Formatting of datapath ids as colon separated hex strings, e.g.
+00:00:00:00:00:00:00:01, with a bounded cache of the formatted ids.
+"""
+
+import struct
+
+CACHE_SIZE = 65536
+
+_BYTE_HEX = ['%02x' % byte for byte in range(256)]
+_DPID = struct.Struct('!Q')
+_cache = {}
+
+def _format(val, pad_to):
+    if 0 <= val < 1 << 64 and pad_to <= 8:
+        octets = bytearray(_DPID.pack(val))[8 - max(pad_to, (val.bit_length() + 7) // 8):]
+        return ':'.join([_BYTE_HEX[octet] for octet in octets])
+
+    digits = '%x' % val
+    digits = digits.zfill(max(pad_to * 2, len(digits) + len(digits) % 2))
+    return ':'.join([digits[i:i + 2] for i in range(0, len(digits), 2)])
+
+def format_dpid(val, pad_to=8):
+    if pad_to != 8:
+        return _format(val, pad_to)
+
+    formatted = _cache.get(val)
+    if formatted is None:
+        if len(_cache) >= CACHE_SIZE:
+            _cache.clear()
+        formatted = _cache[val] = _format(val, pad_to)
+    return formatted
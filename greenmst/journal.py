@@ -0,0 +1,160 @@
+# Copyright (C) 2014 Andrea Biancini <andrea.biancini@gmail.com>.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+__author__ = 'Andrea Biancini <andrea.biancini@gmail.com>'
+
+"""
+Append-only journal of the topology and cost changes, compacted into a
+snapshot every few records, from which the topology is restored when the
+controller restarts. Records are JSON arrays, one per line:
+
+    ["add", src, src_port, dst, dst_port, cost]
+    ["remove", src, src_port, dst, dst_port]
+    ["cost", src, dst, cost]
+    ["costs", [[src, dst, cost], ...]]
+"""
+
+import json
+import os
+
+from link import Link, link_key
+
+class TopologyJournal(object):
+    SNAPSHOT = 'snapshot.json'
+    JOURNAL = 'journal.log'
+
+    def __init__(self, directory, snapshot_every=1000, sync=False):
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        self.sync = sync
+        self.records = 0
+        self.file = None
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    @property
+    def snapshot_path(self):
+        return os.path.join(self.directory, self.SNAPSHOT)
+
+    @property
+    def journal_path(self):
+        return os.path.join(self.directory, self.JOURNAL)
+
+    @property
+    def due(self):
+        return self.records >= self.snapshot_every
+
+    def load(self):
+        # Returns the links and the (src, dst, cost) triples of the last
+        # known state, or None if nothing was saved
+        links = {}
+        costs = {}
+        found = False
+
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path) as snapshot_file:
+                snapshot = json.load(snapshot_file)
+            found = True
+            for src, src_port, dst, dst_port, cost in snapshot['links']:
+                link = Link(src=src, src_port=src_port, dst=dst, dst_port=dst_port, cost=cost)
+                links[link.key] = link
+            for src, dst, cost in snapshot['costs']:
+                costs[(src, dst)] = cost
+
+        self.records = 0
+        if os.path.exists(self.journal_path):
+            offset = 0
+            with open(self.journal_path, 'r+') as journal_file:
+                for line in iter(journal_file.readline, ''):
+                    record = None
+                    if line.endswith('\n'):
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            pass
+                    if record is None:
+                        # The last record was not completely written: it is
+                        # cut away, so that the next ones follow a whole line
+                        journal_file.truncate(offset)
+                        break
+                    self._apply(record, links, costs)
+                    offset += len(line)
+                    self.records += 1
+                    found = True
+
+        if not found:
+            return None
+        return list(links.values()), [(src, dst, cost) for (src, dst), cost in costs.items()]
+
+    @staticmethod
+    def _apply(record, links, costs):
+        operation = record[0]
+        if operation == 'add':
+            src, src_port, dst, dst_port, cost = record[1:]
+            link = Link(src=src, src_port=src_port, dst=dst, dst_port=dst_port, cost=cost)
+            links[link.key] = link
+        elif operation == 'remove':
+            links.pop(link_key(*record[1:]), None)
+        elif operation == 'cost':
+            src, dst, cost = record[1:]
+            costs[(min(src, dst), max(src, dst))] = cost
+        elif operation == 'costs':
+            costs.clear()
+            for src, dst, cost in record[1]:
+                costs[(min(src, dst), max(src, dst))] = cost
+
+    def _append(self, record):
+        if self.file is None:
+            self.file = open(self.journal_path, 'a')
+        self.file.write(json.dumps(record) + '\n')
+        self.file.flush()
+        if self.sync:
+            os.fsync(self.file.fileno())
+        self.records += 1
+
+    def add(self, link):
+        self._append(['add', link.src, link.src_port, link.dst, link.dst_port, link.cost])
+
+    def remove(self, link):
+        self._append(['remove', link.src, link.src_port, link.dst, link.dst_port])
+
+    def cost(self, src, dst, cost):
+        self._append(['cost', src, dst, cost])
+
+    def costs(self, costs):
+        self._append(['costs', [[src, dst, cost] for src, dst, cost in costs]])
+
+    def compact(self, links, costs):
+        # The snapshot replaces the journal: it is written aside and renamed,
+        # so that a crash leaves either the old or the new state on disk
+        snapshot = {
+            'links': [[link.src, link.src_port, link.dst, link.dst_port, link.cost] for link in links],
+            'costs': [[src, dst, cost] for src, dst, cost in costs]
+        }
+        temporary = self.snapshot_path + '.tmp'
+        with open(temporary, 'w') as snapshot_file:
+            json.dump(snapshot, snapshot_file)
+            snapshot_file.flush()
+            os.fsync(snapshot_file.fileno())
+        os.rename(temporary, self.snapshot_path)
+
+        self.close()
+        open(self.journal_path, 'w').close()
+        self.records = 0
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
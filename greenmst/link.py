@@ -15,28 +15,40 @@
 
 from ryu.topology.api import get_switch
 from topology_costs import TopologyCosts
+from dpid import format_dpid
 import json
 
 __author__ = 'Andrea Biancini <andrea.biancini@gmail.com>'
 
-class Link():
-    def __init__(self, src=None, dst=None, src_port=None, dst_port=None, link=None, cost=None):
-        topo_costs = TopologyCosts()
+def link_key(src, src_port, dst, dst_port):
+    # A link and its inverse share the same undirected key
+    src_end = (src, src_port)
+    dst_end = (dst, dst_port)
+    return (src_end, dst_end) if src_end <= dst_end else (dst_end, src_end)
+
+class Link(object):
+    __slots__ = ('src', 'dst', 'src_port', 'dst_port', 'cost', 'key')
 
+    def __init__(self, src=None, dst=None, src_port=None, dst_port=None, link=None, cost=None):
         if link:
-            msg = link.to_dict()
-            self.src = int(msg['src']['dpid'])
-            self.dst = int(msg['dst']['dpid'])
-            self.src_port = int(msg['src']['port_no'])
-            self.dst_port = int(msg['dst']['port_no'])
-        else:
-            topo_costs = TopologyCosts()
-            self.src = src
-            self.dst = dst
-            self.src_port = src_port
-            self.dst_port = dst_port
-
-        self.cost = cost or topo_costs.get_cost(self.src, self.dst)
+            src, src_port, dst, dst_port = self.endpoints(link)
+
+        if cost is None:
+            cost = TopologyCosts().get_cost(src, dst)
+
+        set_attribute = super(Link, self).__setattr__
+        set_attribute('src', src)
+        set_attribute('dst', dst)
+        set_attribute('src_port', src_port)
+        set_attribute('dst_port', dst_port)
+        set_attribute('cost', cost)
+        set_attribute('key', link_key(src, src_port, dst, dst_port))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Link objects are immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError('Link objects are immutable')
 
     def __str__(self):
         return 'Link (%s, %s) with cost: %s' % (self.src, self.dst, self.cost)
@@ -48,34 +60,45 @@ class Link():
         return u'Link (%s, %s) with cost: %s' % (self.src, self.dst, self.cost)
 
     def __eq__(self, other):
-        return self.src == other.src and self.dst == other.dst and self.src_port == other.src_port and self.dst_port == other.dst_port
+        if not isinstance(other, Link):
+            return NotImplemented
+        return self.key == other.key
+
+    def __ne__(self, other):
+        if not isinstance(other, Link):
+            return NotImplemented
+        return self.key != other.key
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __getstate__(self):
+        return (self.src, self.dst, self.src_port, self.dst_port, self.cost)
+
+    def __setstate__(self, state):
+        self.__init__(*state[:4], cost=state[4])
+
+    @staticmethod
+    def endpoints(link):
+        msg = link.to_dict()
+        return (int(msg['src']['dpid']), int(msg['src']['port_no']),
+                int(msg['dst']['dpid']), int(msg['dst']['port_no']))
+
+    def with_cost(self, cost):
+        return Link(src=self.src, dst=self.dst, src_port=self.src_port, dst_port=self.dst_port, cost=cost)
 
     def link_inverse(self):
-        return Link(src=self.dst, dst=self.src, src_port=self.src_port, dst_port=self.dst_port, cost=self.cost)
+        return Link(src=self.dst, dst=self.src, src_port=self.dst_port, dst_port=self.src_port, cost=self.cost)
 
     @classmethod
     def to_hex_string(cls, val, pad_to=8):
-        arr = str(hex(val))[2:]
-        ret = ''
-        # prepend the right number of leading zeros
-        i = 0
-        while i < (pad_to * 2 - len(arr)):
-            ret += '0'
-            if (i % 2) != 0:
-                ret += ':'
-            i = i+1
-
-        for j in range(0, len(arr)):
-            ret += arr[j]
-            if (((i + j) % 2) != 0) and (j < (len(arr) - 1)):
-                ret += ':'
-        return ret;
+        return format_dpid(val, pad_to)
 
     def to_json(self):
         return {
-            'sourceSwitch': self.to_hex_string(self.src),
+            'sourceSwitch': format_dpid(self.src),
             'sourcePort': self.src_port,
-            'destinationSwitch': self.to_hex_string(self.dst),
+            'destinationSwitch': format_dpid(self.dst),
             'destinationPort': self.dst_port,
             'cost': self.cost
         }
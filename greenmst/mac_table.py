@@ -0,0 +1,182 @@
+# Copyright (C) 2014 Andrea Biancini <andrea.biancini@gmail.com>.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+__author__ = 'Andrea Biancini <andrea.biancini@gmail.com>'
+
+"""
+MAC learning tables of the switches. Addresses are stored as 6-byte binary
+strings, with an index of the addresses learnt on each port, and are
+forgotten after an idle timeout or when the table of a switch is full.
+As mappings, the tables are indexed by dpid and then by MAC string.
+"""
+
+import time
+from collections import deque, MutableMapping
+
+from ryu.lib.mac import haddr_to_bin, haddr_to_str
+
+class SwitchMacTable(MutableMapping):
+    def __init__(self, max_entries=4096, idle_timeout=300):
+        self.max_entries = max_entries
+        self.idle_timeout = idle_timeout
+        # key -> [port, last_seen], port -> keys, and the entries in the
+        # order they were learnt, as (queued, key, entry), oldest first
+        self.entries = {}
+        self.ports = {}
+        self.queue = deque()
+        self.expired = 0
+        self.evicted = 0
+
+    def learn(self, key, port, now=None):
+        if now is None:
+            now = time.time()
+
+        entry = self.entries.get(key)
+        if entry is not None:
+            if entry[0] == port:
+                entry[1] = now
+                return
+            self._remove(key)
+
+        entry = [port, now]
+        self.entries[key] = entry
+        self.ports.setdefault(port, set()).add(key)
+        self.queue.append((now, key, entry))
+
+        self.expire(now)
+        if len(self.entries) > self.max_entries:
+            self._evict()
+        if len(self.queue) > 2 * self.max_entries:
+            # Too many entries of purged addresses are still queued
+            self.queue = deque(sorted((entry[1], key, entry) for key, entry in self.entries.items()))
+
+    def lookup(self, key, now=None):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+
+        if self.idle_timeout:
+            if now is None:
+                now = time.time()
+            if entry[1] < now - self.idle_timeout:
+                self._remove(key)
+                self.expired += 1
+                return None
+        return entry[0]
+
+    def expire(self, now=None):
+        if not self.idle_timeout:
+            return 0
+        if now is None:
+            now = time.time()
+
+        deadline = now - self.idle_timeout
+        queue = self.queue
+        count = 0
+        while queue and queue[0][0] < deadline:
+            queued, key, entry = queue.popleft()
+            if self.entries.get(key) is not entry:
+                continue
+            if entry[1] >= deadline:
+                # Seen again since it was queued
+                queue.append((entry[1], key, entry))
+                continue
+            self._remove(key)
+            count += 1
+        self.expired += count
+        return count
+
+    def _evict(self):
+        queue = self.queue
+        while len(self.entries) > self.max_entries:
+            queued, key, entry = queue.popleft()
+            if self.entries.get(key) is not entry:
+                continue
+            if entry[1] > queued:
+                queue.append((entry[1], key, entry))
+                continue
+            self._remove(key)
+            self.evicted += 1
+
+    def _remove(self, key):
+        port = self.entries.pop(key)[0]
+        keys = self.ports[port]
+        keys.discard(key)
+        if not keys:
+            del self.ports[port]
+
+    def purge_port(self, port):
+        keys = self.ports.pop(port, ())
+        for key in keys:
+            del self.entries[key]
+        return len(keys)
+
+    def __getitem__(self, mac):
+        return self.entries[haddr_to_bin(mac)][0]
+
+    def __setitem__(self, mac, port):
+        self.learn(haddr_to_bin(mac), port)
+
+    def __delitem__(self, mac):
+        self._remove(haddr_to_bin(mac))
+
+    def __iter__(self):
+        for key in self.entries:
+            yield haddr_to_str(key)
+
+    def __len__(self):
+        return len(self.entries)
+
+class MacTable(MutableMapping):
+    def __init__(self, max_entries=4096, idle_timeout=300):
+        self.max_entries = max_entries
+        self.idle_timeout = idle_timeout
+        self.switches = {}
+
+    def switch(self, dpid):
+        table = self.switches.get(dpid)
+        if table is None:
+            table = self.switches[dpid] = SwitchMacTable(self.max_entries, self.idle_timeout)
+        return table
+
+    def purge_port(self, dpid, port):
+        table = self.switches.get(dpid)
+        return table.purge_port(port) if table is not None else 0
+
+    def stats(self):
+        tables = self.switches.values()
+        return {
+            'switches': len(tables),
+            'entries': sum(len(table) for table in tables),
+            'expired': sum(table.expired for table in tables),
+            'evicted': sum(table.evicted for table in tables)
+        }
+
+    def __getitem__(self, dpid):
+        return self.switches[dpid]
+
+    def __setitem__(self, dpid, macs):
+        table = SwitchMacTable(self.max_entries, self.idle_timeout)
+        table.update(macs)
+        self.switches[dpid] = table
+
+    def __delitem__(self, dpid):
+        del self.switches[dpid]
+
+    def __iter__(self):
+        return iter(self.switches)
+
+    def __len__(self):
+        return len(self.switches)
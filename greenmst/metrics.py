@@ -0,0 +1,201 @@
+# Copyright (C) 2014 Andrea Biancini <andrea.biancini@gmail.com>.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+__author__ = 'Andrea Biancini <andrea.biancini@gmail.com>'
+
+"""
+Counters, gauges and timing histograms of the controller, exported as JSON
+or in the Prometheus text format. Every metric can have one label, e.g.
+the switch a PortMod was sent to.
+"""
+
+import time
+from bisect import bisect_left
+from functools import wraps
+
+from dpid import format_dpid
+
+# Upper bounds, in seconds, of the timing histogram buckets
+DEFAULT_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+def _label_value(label, value):
+    if label == 'switch' and isinstance(value, (int, long)):
+        return format_dpid(value)
+    return str(value)
+
+def _format_value(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class Counter(object):
+    kind = 'counter'
+
+    def __init__(self, name, description, label=None):
+        self.name = name
+        self.description = description
+        self.label = label
+        self.values = {}
+
+    def inc(self, label_value=None, amount=1):
+        values = self.values
+        values[label_value] = values.get(label_value, 0) + amount
+
+    def get(self, label_value=None):
+        return self.values.get(label_value, 0)
+
+    def samples(self):
+        for label_value, value in sorted(self.values.items()):
+            yield '', label_value, value
+
+    def to_json(self):
+        if self.label is None:
+            return self.values.get(None, 0)
+        return dict((_label_value(self.label, key), value) for key, value in self.values.items())
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def set(self, value, label_value=None):
+        self.values[label_value] = value
+
+class Histogram(object):
+    kind = 'histogram'
+
+    def __init__(self, name, description, label=None, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.label = label
+        self.buckets = tuple(buckets)
+        # For each label value: the count of every bucket (plus the
+        # overflow one), the sum and the number of observations
+        self.series = {}
+
+    def observe(self, value, label_value=None):
+        series = self.series.get(label_value)
+        if series is None:
+            series = self.series[label_value] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def count(self, label_value=None):
+        series = self.series.get(label_value)
+        return series[2] if series is not None else 0
+
+    def time(self, label_value=None):
+        return _Timer(self, label_value)
+
+    def samples(self):
+        for label_value, (counts, total, count) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + ('+Inf',), counts):
+                cumulative += bucket
+                yield '_bucket', label_value, cumulative, bound
+            yield '_sum', label_value, total
+            yield '_count', label_value, count
+
+    def _series_json(self, counts, total, count):
+        cumulative = 0
+        buckets = {}
+        for bound, bucket in zip(self.buckets, counts):
+            cumulative += bucket
+            buckets[repr(bound)] = cumulative
+        return {
+            'count': count,
+            'sum': total,
+            'mean': total / count if count else 0.0,
+            'buckets': buckets
+        }
+
+    def to_json(self):
+        if self.label is None:
+            series = self.series.get(None)
+            if series is None:
+                return self._series_json([0] * len(self.buckets), 0.0, 0)
+            return self._series_json(*series)
+        return dict((_label_value(self.label, key), self._series_json(*series))
+                    for key, series in self.series.items())
+
+class _Timer(object):
+    __slots__ = ('histogram', 'label_value', 'start')
+
+    def __init__(self, histogram, label_value):
+        self.histogram = histogram
+        self.label_value = label_value
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.time() - self.start, self.label_value)
+
+def timed(histogram):
+    # Decorator timing every call of a function, exceptions included
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.time()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                histogram.observe(time.time() - start)
+        return wrapper
+    return decorator
+
+class MetricsRegistry(object):
+    def __init__(self):
+        self.metrics = {}
+
+    def _register(self, metric_class, name, *args, **kwargs):
+        # Registering twice returns the same metric, so modules can be reloaded
+        metric = self.metrics.get(name)
+        if metric is None:
+            metric = self.metrics[name] = metric_class(name, *args, **kwargs)
+        return metric
+
+    def counter(self, name, description, label=None):
+        return self._register(Counter, name, description, label)
+
+    def gauge(self, name, description, label=None):
+        return self._register(Gauge, name, description, label)
+
+    def histogram(self, name, description, label=None, buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, description, label, buckets)
+
+    def to_json(self):
+        return dict((name, metric.to_json()) for name, metric in self.metrics.items())
+
+    def to_prometheus(self):
+        lines = []
+        for name, metric in sorted(self.metrics.items()):
+            lines.append('# HELP %s %s' % (name, metric.description))
+            lines.append('# TYPE %s %s' % (name, metric.kind))
+            for sample in metric.samples():
+                suffix, label_value, value = sample[:3]
+                labels = []
+                if metric.label is not None and label_value is not None:
+                    labels.append('%s="%s"' % (metric.label, _escape(_label_value(metric.label, label_value))))
+                if len(sample) > 3:
+                    labels.append('le="%s"' % sample[3])
+                label_text = '{%s}' % ','.join(labels) if labels else ''
+                lines.append('%s%s%s %s' % (name, suffix, label_text, _format_value(value)))
+        return '\n'.join(lines) + '\n'
+
+registry = MetricsRegistry()
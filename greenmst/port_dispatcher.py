@@ -0,0 +1,139 @@
+# Copyright (C) 2014 Andrea Biancini <andrea.biancini@gmail.com>.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+__author__ = 'Andrea Biancini <andrea.biancini@gmail.com>'
+
+"""
+Groups the PortMod commands of a reconfiguration per datapath, sends them
+back-to-back followed by a barrier and measures how long each switch takes
+to confirm them.
+"""
+
+import time
+from contextlib import contextmanager
+
+class SwitchStats(object):
+    def __init__(self):
+        self.port_mods = 0
+        self.batches = 0
+        self.confirmed = 0
+        self.last_latency = None
+        self.max_latency = None
+        self.total_latency = 0.0
+
+    def record(self, latency):
+        self.confirmed += 1
+        self.last_latency = latency
+        self.max_latency = latency if self.max_latency is None else max(self.max_latency, latency)
+        self.total_latency += latency
+
+    def to_json(self):
+        return {
+            'portMods': self.port_mods,
+            'batches': self.batches,
+            'confirmed': self.confirmed,
+            'lastLatency': self.last_latency,
+            'maxLatency': self.max_latency,
+            'meanLatency': self.total_latency / self.confirmed if self.confirmed else None
+        }
+
+class PortModDispatcher(object):
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self.depth = 0
+        self.queues = {}
+        self.outstanding = {}
+        self.switches = {}
+        self.convergence_start = None
+        self.last_convergence = None
+
+    @property
+    def converged(self):
+        return not self.outstanding
+
+    def stats(self, dpid):
+        return self.switches.setdefault(dpid, SwitchStats())
+
+    def begin(self):
+        self.depth += 1
+
+    @contextmanager
+    def batch(self):
+        self.begin()
+        try:
+            yield self
+        finally:
+            self.commit()
+
+    def send(self, datapath, msg):
+        self.stats(datapath.id).port_mods += 1
+        if not self.depth:
+            datapath.send_msg(msg)
+            return
+
+        queue = self.queues.get(datapath.id)
+        if queue is None:
+            queue = self.queues[datapath.id] = (datapath, [])
+        queue[1].append(msg)
+
+    def commit(self):
+        self.depth -= 1
+        if self.depth > 0 or not self.queues:
+            return
+
+        queues = self.queues
+        self.queues = {}
+        now = self.clock()
+        if self.convergence_start is None:
+            self.convergence_start = now
+
+        for dpid, (datapath, msgs) in queues.items():
+            for msg in msgs:
+                datapath.send_msg(msg)
+
+            barrier = datapath.ofproto_parser.OFPBarrierRequest(datapath)
+            datapath.set_xid(barrier)
+            datapath.send_msg(barrier)
+            self.outstanding[(dpid, barrier.xid)] = now
+            self.stats(dpid).batches += 1
+
+    def confirm(self, dpid, xid):
+        sent = self.outstanding.pop((dpid, xid), None)
+        if sent is None:
+            return None
+
+        now = self.clock()
+        latency = now - sent
+        self.stats(dpid).record(latency)
+        if not self.outstanding and self.convergence_start is not None:
+            self.last_convergence = now - self.convergence_start
+            self.convergence_start = None
+        return latency
+
+    def forget(self, dpid):
+        # Barriers sent to a switch that left will never be answered
+        self.queues.pop(dpid, None)
+        for key in [key for key in self.outstanding if key[0] == dpid]:
+            del self.outstanding[key]
+        if not self.outstanding:
+            self.convergence_start = None
+
+    def to_json(self):
+        return {
+            'converged': self.converged,
+            'outstanding': len(self.outstanding),
+            'lastConvergence': self.last_convergence,
+            'switches': dict((str(dpid), stats.to_json()) for dpid, stats in self.switches.items())
+        }
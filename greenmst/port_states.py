@@ -0,0 +1,77 @@
+# Copyright (C) 2014 Andrea Biancini <andrea.biancini@gmail.com>.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+__author__ = 'Andrea Biancini <andrea.biancini@gmail.com>'
+
+"""
+Desired and applied state of the switch ports handled by GreenMST. Ports
+are identified by (dpid, port_no) and are either open or closed (blocked
+for flooding or turned off, depending on the controller configuration).
+"""
+
+class PortStateTable(object):
+    def __init__(self):
+        self.desired = {}
+        self.applied = set()
+        self.dirty = set()
+
+    def is_closed(self, dpid, port_no):
+        return (dpid, port_no) in self.desired
+
+    def close(self, link):
+        for endpoint in link.key:
+            self.desired[endpoint] = link
+            self.dirty.add(endpoint)
+
+    def open(self, link):
+        for endpoint in link.key:
+            if self.desired.get(endpoint) == link:
+                del self.desired[endpoint]
+            self.dirty.add(endpoint)
+
+    def set_closed(self, links):
+        self.dirty.update(self.desired)
+        self.dirty.update(self.applied)
+        self.desired = {}
+        for link in links:
+            self.close(link)
+
+    def changes(self):
+        # Ports whose desired state differs from the applied one, as
+        # (endpoint, open) pairs: one entry per port at most
+        changes = []
+        for endpoint in sorted(self.dirty):
+            closed = endpoint in self.desired
+            if closed != (endpoint in self.applied):
+                changes.append((endpoint, not closed))
+        self.dirty.clear()
+        return changes
+
+    def mark_applied(self, endpoint, open):
+        if open:
+            self.applied.discard(endpoint)
+        else:
+            self.applied.add(endpoint)
+
+    def touch_switch(self, dpid):
+        # The ports of a (re)connected switch are checked again
+        self.dirty.update(endpoint for endpoint in self.desired if endpoint[0] == dpid)
+        self.dirty.update(endpoint for endpoint in self.applied if endpoint[0] == dpid)
+
+    def forget_switch(self, dpid):
+        for endpoint in [endpoint for endpoint in self.desired if endpoint[0] == dpid]:
+            del self.desired[endpoint]
+        for endpoint in [endpoint for endpoint in self.applied if endpoint[0] == dpid]:
+            self.applied.discard(endpoint)
@@ -22,5 +22,7 @@ class LinkEncoder(json.JSONEncoder):
     def default(self, obj):
         if isinstance(obj, Link):
             return obj.to_json()
+        if isinstance(obj, (set, frozenset)):
+            return list(obj)
         # Let the base class default method raise the TypeError
         return json.JSONEncoder.default(self, obj)
\ No newline at end of file
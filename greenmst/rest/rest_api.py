@@ -22,9 +22,12 @@ from ryu.app.wsgi import ControllerBase, WSGIApplication, route
 from ryu.topology import switches
 from webob import Response
 
-from encoder import LinkEncoder
 from ..controller import Controller
 from ..topology_costs import TopologyCosts
+from ..metrics import registry
+
+EDGE_COLLECTIONS = 'topoedges|mstedges|redundantedges'
+COST_KEY = re.compile('^\\d+,\\d+$')
 
 class ControllerWithRestAPI(Controller):
     _CONTEXTS = {
@@ -40,26 +43,122 @@ class ControllerWithRestAPI(Controller):
             wsgi.register(GreenMSTAPIController, {'green_mst_api_app': self})
 
 class GreenMSTAPIController(ControllerBase):
+    page_size = 1000
+    # Longest time in seconds a long polling request for changes is held
+    max_wait = 60
+
     def __init__(self, req, link, data, **config):
         super(GreenMSTAPIController, self).__init__(req, link, data, **config)
         self.topology_api_app = data['green_mst_api_app']
 
+    def snapshot_response(self, req, name):
+        # Responses are served from the cached serialization of the current
+        # snapshot, and clients holding the same version get a 304
+        snapshot = self.topology_api_app.current_snapshot()
+        if req is not None and snapshot.etag in req.if_none_match:
+            return Response(status=304, etag=snapshot.etag)
+        return Response(content_type='application/json', body=snapshot.body(name), etag=snapshot.etag)
+
+    @staticmethod
+    def error_response(message):
+        return Response(status=400, content_type='application/json', body=json.dumps({ 'status': message }))
+
+    @staticmethod
+    def parse_dpid(value):
+        # Accepts both decimal ids and the colon separated hex format
+        if value is None:
+            return None
+        if ':' in value:
+            return int(value.replace(':', ''), 16)
+        return int(value)
+
+    @route('greenmst', '/wm/greenmst/{collection}/page/json', methods=['GET'],
+           requirements={'collection': EDGE_COLLECTIONS})
+    def page_edges(self, req, collection, **kwargs):
+        try:
+            offset = int(req.GET.get('offset', 0))
+            limit = int(req.GET.get('limit', self.page_size))
+            dpid = self.parse_dpid(req.GET.get('dpid'))
+        except ValueError:
+            return self.error_response('Error! Invalid offset, limit or dpid.')
+        if offset < 0 or limit <= 0:
+            return self.error_response('Error! Invalid offset, limit or dpid.')
+
+        snapshot = self.topology_api_app.current_snapshot()
+        if snapshot.etag in req.if_none_match:
+            return Response(status=304, etag=snapshot.etag)
+
+        edges = snapshot.edges(collection, dpid)
+        body = json.dumps({
+            'version': snapshot.version,
+            'offset': offset,
+            'limit': limit,
+            'total': len(edges),
+            'edges': [link.to_json() for link in edges[offset:offset + limit]]
+        })
+        return Response(content_type='application/json', body=body, etag=snapshot.etag)
+
+    @route('greenmst', '/wm/greenmst/{collection}/ndjson', methods=['GET'],
+           requirements={'collection': EDGE_COLLECTIONS})
+    def stream_edges(self, req, collection, **kwargs):
+        try:
+            dpid = self.parse_dpid(req.GET.get('dpid'))
+        except ValueError:
+            return self.error_response('Error! Invalid dpid.')
+
+        snapshot = self.topology_api_app.current_snapshot()
+        if snapshot.etag in req.if_none_match:
+            return Response(status=304, etag=snapshot.etag)
+        return Response(content_type='application/x-ndjson', app_iter=snapshot.stream(collection, dpid),
+                        etag=snapshot.etag)
+
+    @route('greenmst', '/wm/greenmst/changes/json', methods=['GET'])
+    def list_changes(self, req, **kwargs):
+        try:
+            since = int(req.GET.get('since', 0))
+            wait = float(req.GET.get('wait', 0))
+        except ValueError:
+            return self.error_response('Error! Invalid since or wait.')
+
+        changes = self.topology_api_app.changes
+        if wait > 0:
+            changes.wait(since, min(wait, self.max_wait))
+
+        body = json.dumps({
+            'version': changes.version,
+            'truncated': changes.truncated(since),
+            'changes': [event.to_json() for event in changes.since(since)]
+        })
+        return Response(content_type='application/json', body=body)
+
+    @route('greenmst', '/wm/greenmst/metrics', methods=['GET'])
+    def list_metrics(self, req, **kwargs):
+        metrics = self.topology_api_app.collect_metrics()
+
+        # Prometheus asks for text/plain, anything else gets JSON
+        accept = req.headers.get('Accept', '')
+        output = req.GET.get('format')
+        if output is None and 'text/plain' in accept and 'application/json' not in accept:
+            output = 'prometheus'
+        if output == 'prometheus':
+            return Response(body=registry.to_prometheus(),
+                            headerlist=[('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')])
+        return Response(content_type='application/json', body=json.dumps(metrics))
+
     @route('greenmst', '/wm/greenmst/topocosts/json', methods=['GET'])
     def list_topocosts(self, req, **kwargs):
-        body = json.dumps(self.topology_api_app.topology_costs, cls=LinkEncoder)
-        return Response(content_type='application/json', body=body)
+        return self.snapshot_response(req, 'topocosts')
 
     @staticmethod
     def validate_input(new_costs):
         if not isinstance(new_costs, list):
             return False
 
-        pattern = re.compile('\\d+,\\d+')
         for newcost in new_costs:
             if not isinstance(newcost, dict):
                 return False
             for key,val in newcost.iteritems():
-                if not pattern.match(key):
+                if not COST_KEY.match(key):
                     return False
                 if not isinstance(val, (int, long, float)):
                     return False
@@ -68,32 +167,83 @@ class GreenMSTAPIController(ControllerBase):
 
     @route('greenmst', '/wm/greenmst/topocosts/json', methods=['POST'])
     def set_topocosts(self, req, **kwargs):
-        new_costs = self.topology_api_app.topology_costs
-
         # Validate JSON passed as input
-        if req.body:
-            new_costs = json.loads(req.body)
-            valid_input = self.validate_input(new_costs)
+        try:
+            new_costs = json.loads(req.body) if req.body else None
+        except ValueError:
+            new_costs = None
+        valid_input = new_costs is not None and self.validate_input(new_costs)
 
         if valid_input:
-            self.topology_api_app.set_costs(new_costs)
-            body = json.dumps({ 'status': 'new topology costs set' })
-        else:
-            body = json.dumps({ 'status': 'Error! Could not parse new topology costs, see log for details.' })
+            try:
+                self.topology_api_app.set_costs(new_costs)
+            except ValueError:
+                valid_input = False
+        if not valid_input:
+            return self.error_response('Error! Could not parse new topology costs, see log for details.')
+
+        body = json.dumps({ 'status': 'new topology costs set' })
+        return Response(content_type='application/json', body=body)
 
+    @staticmethod
+    def validate_cost_changes(changes):
+        # Returns the (source, destination, cost) triples, or None if any of
+        # the changes is invalid, so that either all or none are applied
+        if not isinstance(changes, list):
+            return None
+
+        triples = []
+        for change in changes:
+            if not isinstance(change, list) or len(change) != 3:
+                return None
+            source, destination, cost = change
+            for dpid in (source, destination):
+                if isinstance(dpid, bool) or not isinstance(dpid, (int, long)) or dpid < 0:
+                    return None
+            if isinstance(cost, bool) or not isinstance(cost, (int, long, float)) or cost < 0:
+                return None
+            # Costs are integers: fractional ones are refused, not truncated
+            if isinstance(cost, float) and not cost.is_integer():
+                return None
+            triples.append((source, destination, int(cost)))
+        return triples
+
+    @route('greenmst', '/wm/greenmst/topocosts/json', methods=['PATCH'])
+    def patch_topocosts(self, req, **kwargs):
+        try:
+            changes = self.validate_cost_changes(json.loads(req.body)) if req.body else None
+        except ValueError:
+            changes = None
+        if changes is None:
+            return self.error_response('Error! Topology cost changes must be a list of [source, destination, cost].')
+
+        links, events, since, pending = self.topology_api_app.patch_costs(changes)
+        added = []
+        removed = []
+        for event in events:
+            added.extend(link.to_json() for link in event.added)
+            removed.extend(link.to_json() for link in event.removed)
+
+        body = json.dumps({
+            'status': 'topology costs updated',
+            'costs': len(changes),
+            'updatedLinks': len(links),
+            'version': self.topology_api_app.changes.version,
+            'since': since,
+            'pending': pending,
+            'addedEdges': added,
+            'removedEdges': removed
+        })
         return Response(content_type='application/json', body=body)
 
     @route('greenmst', '/wm/greenmst/mstedges/json', methods=['GET'])
     def list_mstedges(self, req, **kwargs):
-        body = json.dumps(self.topology_api_app.mst_edges, cls=LinkEncoder)
-        return Response(content_type='application/json', body=body)
+        return self.snapshot_response(req, 'mstedges')
 
     @route('greenmst', '/wm/greenmst/topoedges/json', methods=['GET'])
     def list_topoedges(self, req, **kwargs):
-        body = json.dumps(self.topology_api_app.topo_edges, cls=LinkEncoder)
-        return Response(content_type='application/json', body=body)
+        return self.snapshot_response(req, 'topoedges')
 
     @route('greenmst', '/wm/greenmst/redundantedges/json', methods=['GET'])
     def list_redundant_edges(self, req, **kwargs):
-        body = json.dumps(self.topology_api_app.redundant_edges, cls=LinkEncoder)
-        return Response(content_type='application/json', body=body)
+        return self.snapshot_response(req, 'redundantedges')
@@ -18,10 +18,17 @@ __author__ = 'Andrea Biancini <andrea.biancini@gmail.com>'
 import json
 import ConfigParser
 from nose.tools import assert_equals, assert_true, raises
-from mock import Mock
+from mock import Mock, patch
+from webob import Request
 from rest_api import ControllerWithRestAPI, GreenMSTAPIController
 from encoder import LinkEncoder
 from ..link import Link
+from ..dpid import format_dpid
+from ..change_log import ChangeLog
+from ..background import BackgroundSolver
+from ..algorithm import kruskal
+from .. import metrics
+from ryu.ofproto import ofproto_v1_0, ofproto_v1_0_parser
 from ..topology_costs import TopologyCosts
 
 config = ConfigParser.RawConfigParser()
@@ -130,7 +137,7 @@ def test_set_topocosts_invalid():
  
     # assert
     body = result.json
-    assert_equals(200, result.status_code) 
+    assert_equals(400, result.status_code) 
     assert_equals('application/json', result.content_type)
     assert_equals('Error! Could not parse new topology costs, see log for details.', body['status'])
 
@@ -237,3 +244,370 @@ def test_list_redundant_edges():
                         'destinationPort': curlink.src_port, 
                         'cost': curlink.cost }
         assert_true(curitem in body or curitem_rev in body)
+
+def test_list_mstedges_etag():
+    # arrange
+    apis = ControllerWithRestAPI()
+    apis.mod_port = Mock()
+    apis.mst_edges = set([Link(src=1, src_port=1, dst=2, dst_port=1, cost=1)])
+    controller = GreenMSTAPIController(None, None, {'green_mst_api_app': apis })
+
+    # act
+    first = controller.list_mstedges(Request.blank('/wm/greenmst/mstedges/json'))
+    cached = controller.list_mstedges(Request.blank('/wm/greenmst/mstedges/json', if_none_match=first.etag))
+    apis.update_edges([Link(src=2, src_port=2, dst=3, dst_port=1, cost=1)])
+    changed = controller.list_mstedges(Request.blank('/wm/greenmst/mstedges/json', if_none_match=first.etag))
+
+    # assert
+    assert_equals(200, first.status_code)
+    assert_equals(1, len(first.json))
+    assert_equals(304, cached.status_code)
+    assert_equals(first.etag, cached.etag)
+    assert_equals(200, changed.status_code)
+    assert_true(changed.etag != first.etag)
+
+def test_snapshot_immutable():
+    # arrange
+    link = Link(src=1, src_port=1, dst=2, dst_port=1, cost=1)
+    apis = ControllerWithRestAPI()
+    apis.topo_edges = [link]
+
+    # act
+    snapshot = apis.current_snapshot()
+    body = snapshot.body('topoedges')
+    apis.topology.remove(link.key)
+    latest = apis.current_snapshot()
+
+    # assert
+    assert_true(body is snapshot.body('topoedges'))
+    assert_equals((link,), snapshot.get('topoedges'))
+    assert_equals((), latest.get('topoedges'))
+    assert_equals(snapshot.version + 1, latest.version)
+
+def test_format_dpid():
+    # arrange
+    values = [0, 1, 255, 256, 123153254236413643, (1 << 64) - 1]
+
+    # act
+    result = [format_dpid(value) for value in values]
+
+    # assert
+    for value, formatted in zip(values, result):
+        digits = '%016x' % value
+        assert_equals(':'.join(digits[i:i + 2] for i in range(0, 16, 2)), formatted)
+    assert_equals('00:00:00:00:00:00:00:01', format_dpid(1))
+    assert_true(format_dpid(123153254236413643) is result[4])
+
+def test_format_dpid_padding():
+    # act
+    short = format_dpid(0x1ff, pad_to=4)
+    large = format_dpid(1 << 64, pad_to=8)
+
+    # assert
+    assert_equals('00:00:01:ff', short)
+    assert_equals('01:00:00:00:00:00:00:00:00', large)
+
+def test_page_edges():
+    # arrange
+    topo_edges = []
+    topo_edges.append(Link(src=1, src_port=1, dst=2, dst_port=1, cost=1))
+    topo_edges.append(Link(src=1, src_port=2, dst=3, dst_port=1, cost=4))
+    topo_edges.append(Link(src=1, src_port=3, dst=4, dst_port=1, cost=2))
+    topo_edges.append(Link(src=2, src_port=2, dst=3, dst_port=2, cost=3))
+
+    apis = ControllerWithRestAPI()
+    apis.topo_edges = topo_edges
+    controller = GreenMSTAPIController(None, None, {'green_mst_api_app': apis })
+
+    # act
+    first = controller.page_edges(Request.blank('/?limit=3'), collection='topoedges')
+    second = controller.page_edges(Request.blank('/?offset=3&limit=3'), collection='topoedges')
+
+    # assert
+    assert_equals(200, first.status_code)
+    assert_equals(4, first.json['total'])
+    assert_equals(3, len(first.json['edges']))
+    assert_equals(1, len(second.json['edges']))
+    assert_equals(first.json['version'], second.json['version'])
+    assert_equals(sorted(link.to_json() for link in topo_edges),
+                  sorted(first.json['edges'] + second.json['edges']))
+
+def test_page_edges_dpid_filter():
+    # arrange
+    topo_edges = []
+    topo_edges.append(Link(src=1, src_port=1, dst=2, dst_port=1, cost=1))
+    topo_edges.append(Link(src=1, src_port=2, dst=3, dst_port=1, cost=4))
+    topo_edges.append(Link(src=2, src_port=2, dst=3, dst_port=2, cost=3))
+
+    apis = ControllerWithRestAPI()
+    apis.topo_edges = topo_edges
+    controller = GreenMSTAPIController(None, None, {'green_mst_api_app': apis })
+
+    # act
+    decimal = controller.page_edges(Request.blank('/?dpid=3'), collection='topoedges')
+    hexadecimal = controller.page_edges(Request.blank('/?dpid=00:00:00:00:00:00:00:03'), collection='topoedges')
+    invalid = controller.page_edges(Request.blank('/?dpid=switch'), collection='topoedges')
+
+    # assert
+    assert_equals(2, decimal.json['total'])
+    assert_equals(decimal.json, hexadecimal.json)
+    assert_equals(400, invalid.status_code)
+
+def test_stream_edges():
+    # arrange
+    redundant_edges = set()
+    redundant_edges.add(Link(src=1, src_port=2, dst=3, dst_port=1, cost=4))
+    redundant_edges.add(Link(src=2, src_port=3, dst=4, dst_port=2, cost=4))
+    redundant_edges.add(Link(src=2, src_port=2, dst=3, dst_port=2, cost=3))
+
+    apis = ControllerWithRestAPI()
+    apis.redundant_edges = redundant_edges
+    controller = GreenMSTAPIController(None, None, {'green_mst_api_app': apis })
+
+    # act
+    result = controller.stream_edges(Request.blank('/'), collection='redundantedges')
+    chunks = list(apis.current_snapshot().stream('redundantedges', chunk_size=2))
+
+    # assert
+    lines = result.body.splitlines()
+    assert_equals('application/x-ndjson', result.content_type)
+    assert_equals(3, len(lines))
+    assert_equals(sorted(link.to_json() for link in redundant_edges), sorted(json.loads(line) for line in lines))
+    assert_equals(2, len(chunks))
+
+def test_list_changes():
+    # arrange
+    topo_edges = []
+    topo_edges.append(Link(src=1, src_port=1, dst=2, dst_port=1, cost=1))
+    topo_edges.append(Link(src=2, src_port=2, dst=3, dst_port=1, cost=2))
+    topo_edges.append(Link(src=1, src_port=2, dst=3, dst_port=2, cost=3))
+
+    apis = ControllerWithRestAPI()
+    apis.mod_port = Mock(return_value=True)
+    apis.topo_edges = topo_edges
+    apis.update_links()
+    apis.topology.remove(topo_edges[1].key)
+    apis.apply_changes([topo_edges[1]])
+    controller = GreenMSTAPIController(None, None, {'green_mst_api_app': apis })
+
+    # act
+    result = controller.list_changes(Request.blank('/?since=1'))
+    everything = controller.list_changes(Request.blank('/'))
+
+    # assert
+    body = result.json
+    assert_equals(2, body['version'])
+    assert_equals(False, body['truncated'])
+    assert_equals(1, len(body['changes']))
+    change = body['changes'][0]
+    assert_equals(2, change['version'])
+    assert_equals([topo_edges[2].to_json()], change['addedEdges'])
+    assert_equals([topo_edges[1].to_json()], change['removedEdges'])
+    assert_equals(2, len(change['openedPorts']))
+    assert_equals([], change['closedPorts'])
+    assert_true(change['duration'] >= 0)
+
+    assert_equals(2, len(everything.json['changes']))
+    assert_equals(2, len(everything.json['changes'][0]['addedEdges']))
+    assert_equals(2, len(everything.json['changes'][0]['closedPorts']))
+
+def test_list_changes_truncated():
+    # arrange
+    apis = ControllerWithRestAPI()
+    apis.changes = ChangeLog(size=2)
+    for port in range(1, 5):
+        apis.changes.record([Link(src=1, src_port=port, dst=2, dst_port=port, cost=1)], [], [], [], 0.0)
+    controller = GreenMSTAPIController(None, None, {'green_mst_api_app': apis })
+
+    # act
+    result = controller.list_changes(Request.blank('/?since=1'))
+    current = controller.list_changes(Request.blank('/?since=4&wait=0.01'))
+
+    # assert
+    assert_equals(True, result.json['truncated'])
+    assert_equals([3, 4], [change['version'] for change in result.json['changes']])
+    assert_equals(False, current.json['truncated'])
+    assert_equals([], current.json['changes'])
+
+def test_list_changes_ahead():
+    # arrange
+    apis = ControllerWithRestAPI()
+    apis.changes.record([Link(src=1, src_port=1, dst=2, dst_port=1, cost=1)], [], [], [], 0.0)
+    apis.changes.updated = Mock()
+    controller = GreenMSTAPIController(None, None, {'green_mst_api_app': apis })
+
+    # act
+    result = controller.list_changes(Request.blank('/?since=50&wait=30'))
+
+    # assert
+    assert_equals(0, apis.changes.updated.wait.call_count)
+    assert_equals(1, result.json['version'])
+    assert_equals(True, result.json['truncated'])
+    assert_equals([], result.json['changes'])
+
+def test_set_topocosts_malformed_keys():
+    # arrange
+    TopologyCosts().costs = { '1,2': 1 }
+    apis = ControllerWithRestAPI()
+    controller = GreenMSTAPIController(None, None, {'green_mst_api_app': apis })
+
+    # act
+    results = []
+    for costs in [[{'1,2,3': 5}], [{'1,2x': 5}], [{'1,3': 5, 'x1,2': 5}]]:
+        results.append(controller.set_topocosts(Mock(body=json.dumps(costs))))
+
+    # assert
+    for result in results:
+        assert_equals(400, result.status_code)
+    assert_equals({ '1,2': 1 }, TopologyCosts().costs)
+
+def test_set_topocosts_empty():
+    # arrange
+    apis = ControllerWithRestAPI()
+    apis.set_costs = Mock()
+    controller = GreenMSTAPIController(None, None, {'green_mst_api_app': apis })
+
+    # act
+    result = controller.set_topocosts(Mock(body=''))
+
+    # assert
+    assert_equals('Error! Could not parse new topology costs, see log for details.', result.json['status'])
+    assert_equals(0, apis.set_costs.call_count)
+
+def test_patch_topocosts():
+    # arrange
+    topo_edges = []
+    topo_edges.append(Link(src=1, src_port=1, dst=2, dst_port=1, cost=1))
+    topo_edges.append(Link(src=2, src_port=2, dst=3, dst_port=1, cost=2))
+    topo_edges.append(Link(src=1, src_port=2, dst=3, dst_port=2, cost=3))
+    TopologyCosts().costs = { '1,2': 1, '2,3': 2, '1,3': 3 }
+
+    apis = ControllerWithRestAPI()
+    apis.mod_port = Mock(return_value=True)
+    apis.topo_edges = topo_edges
+    apis.update_links()
+    apis.apply_changes = Mock(wraps=apis.apply_changes)
+    apis.coalescer.apply_changes = apis.apply_changes
+    controller = GreenMSTAPIController(None, None, {'green_mst_api_app': apis })
+
+    # act
+    result = controller.patch_topocosts(Mock(body=json.dumps([[3, 2, 10], [1, 3, 2], [1, 2, 1]])))
+
+    # assert
+    body = result.json
+    assert_equals(200, result.status_code)
+    assert_equals(3, body['costs'])
+    assert_equals(2, body['updatedLinks'])
+    assert_equals([topo_edges[2].with_cost(2).to_json()], body['addedEdges'])
+    assert_equals([topo_edges[1].with_cost(10).to_json()], body['removedEdges'])
+    assert_equals(1, apis.apply_changes.call_count)
+    assert_equals(10, TopologyCosts().get_cost(2, 3))
+    assert_equals(False, body['pending'])
+    assert_equals(body['version'] - 1, body['since'])
+
+def test_patch_topocosts_background():
+    # arrange
+    topo_edges = []
+    topo_edges.append(Link(src=1, src_port=1, dst=2, dst_port=1, cost=1))
+    topo_edges.append(Link(src=2, src_port=2, dst=3, dst_port=1, cost=2))
+    topo_edges.append(Link(src=1, src_port=2, dst=3, dst_port=2, cost=3))
+    TopologyCosts().costs = { '1,2': 1, '2,3': 2, '1,3': 3 }
+
+    apis = ControllerWithRestAPI()
+    apis.mod_port = Mock(return_value=True)
+    apis.topo_edges = topo_edges
+    apis.update_links()
+    apis.background = BackgroundSolver(kruskal.perform, apis.topology_snapshot, apis.apply_tree, threaded=False)
+    controller = GreenMSTAPIController(None, None, {'green_mst_api_app': apis })
+
+    # act
+    with patch('ryu.lib.hub.spawn') as mock_spawn:
+        result = controller.patch_topocosts(Mock(body=json.dumps([[3, 2, 10], [1, 3, 2]])))
+        mock_spawn.call_args[0][0]()
+    changes = controller.list_changes(Request.blank('/wm/greenmst/changes/json?since=%s' % result.json['since']))
+
+    # assert
+    body = result.json
+    assert_equals(True, body['pending'])
+    assert_equals([], body['addedEdges'])
+    assert_equals([topo_edges[2].with_cost(2).to_json()], changes.json['changes'][0]['addedEdges'])
+
+def test_patch_topocosts_invalid():
+    # arrange
+    TopologyCosts().costs = { '1,2': 1 }
+    apis = ControllerWithRestAPI()
+    apis.apply_changes = Mock()
+    apis.coalescer.apply_changes = apis.apply_changes
+    controller = GreenMSTAPIController(None, None, {'green_mst_api_app': apis })
+
+    # act
+    results = []
+    for body in ['[[1, 2, 5], [1, 3]]', '[[1, 2, 5], [1, "3", 2]]', '[[1, 2, 2.9]]', '[[1, 2, Infinity]]', '{"1,2": 5}', 'not json', '']:
+        results.append(controller.patch_topocosts(Mock(body=body)))
+
+    # assert
+    for result in results:
+        assert_equals(400, result.status_code)
+    assert_equals(1, TopologyCosts().get_cost(1, 2))
+    assert_equals(0, apis.apply_changes.call_count)
+
+def test_list_metrics():
+    # arrange
+    topo_edges = []
+    topo_edges.append(Link(src=1, src_port=1, dst=2, dst_port=1, cost=1))
+    topo_edges.append(Link(src=2, src_port=2, dst=3, dst_port=1, cost=2))
+    topo_edges.append(Link(src=1, src_port=2, dst=3, dst_port=2, cost=3))
+
+    apis = ControllerWithRestAPI()
+    apis.lookup_port = Mock(return_value=(Mock(id=1, ofproto=ofproto_v1_0, ofproto_parser=ofproto_v1_0_parser), 'ff:00:00:00:00:01'))
+    apis.topo_edges = topo_edges
+    before = metrics.registry.to_json()
+    apis.update_links()
+    controller = GreenMSTAPIController(None, None, {'green_mst_api_app': apis })
+
+    # act
+    result = controller.list_metrics(Request.blank('/wm/greenmst/metrics'))
+
+    # assert
+    body = result.json
+    assert_equals('application/json', result.content_type)
+    assert_equals(before['greenmst_update_links_seconds']['count'] + 1, body['greenmst_update_links_seconds']['count'])
+    assert_equals(before['greenmst_port_mods_total'].get('00:00:00:00:00:00:00:03', 0) + 1,
+                  body['greenmst_port_mods_total']['00:00:00:00:00:00:00:03'])
+    assert_equals(3, body['greenmst_edges']['topology'])
+    assert_equals(1, body['greenmst_edges']['redundant'])
+    assert_true('MSTSolver' in body['greenmst_mst_solve_seconds'])
+    assert_true('coalescer' in body)
+
+def test_list_metrics_prometheus():
+    # arrange
+    apis = ControllerWithRestAPI()
+    controller = GreenMSTAPIController(None, None, {'green_mst_api_app': apis })
+    request = Request.blank('/wm/greenmst/metrics', accept='text/plain;version=0.0.4;q=0.5,*/*;q=0.1')
+
+    # act
+    result = controller.list_metrics(request)
+    forced = controller.list_metrics(Request.blank('/wm/greenmst/metrics?format=prometheus'))
+
+    # assert
+    lines = result.body.splitlines()
+    assert_equals('text/plain', result.content_type)
+    assert_equals(result.body, forced.body)
+    assert_true('# TYPE greenmst_update_links_seconds histogram' in lines)
+    assert_true('greenmst_edges{set="topology"} 0' in lines)
+    assert_true(any(line.startswith('greenmst_update_links_seconds_bucket{le="+Inf"} ') for line in lines))
+
+def test_histogram():
+    # arrange
+    histogram = metrics.Histogram('test_seconds', 'Test histogram', buckets=(0.1, 1.0))
+
+    # act
+    for value in (0.05, 0.5, 0.7, 2.0):
+        histogram.observe(value)
+
+    # assert
+    samples = list(histogram.samples())
+    assert_equals([('_bucket', None, 1, 0.1), ('_bucket', None, 3, 1.0), ('_bucket', None, 4, '+Inf')], samples[:3])
+    assert_equals(('_count', None, 4), samples[4])
+    assert_equals(4, histogram.to_json()['count'])
+    assert_equals(3, histogram.to_json()['buckets']['1.0'])
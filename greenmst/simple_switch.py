@@ -20,6 +20,7 @@ __author__ = 'Andrea Biancini <andrea.biancini@gmail.com>'
 
 import logging
 import struct
+import time
 
 from ryu.base import app_manager
 from ryu.controller import mac_to_port
@@ -27,24 +28,55 @@ from ryu.controller import ofp_event
 from ryu.controller.handler import MAIN_DISPATCHER
 from ryu.controller.handler import set_ev_cls
 from ryu.ofproto import ofproto_v1_0, ether
-from ryu.lib.mac import haddr_to_bin
 from ryu.lib.packet import packet
-from ryu.lib.packet import ethernet
-
+from ryu.lib.packet import vlan
+from metrics import registry, timed
+from mac_table import MacTable
+
+PACKET_IN = registry.counter('greenmst_packet_in_total', 'Packet-in messages received', 'switch')
+PACKET_IN_TIME = registry.histogram('greenmst_packet_in_seconds', 'Time spent handling packet-in messages')
+PACKET_IN_PARSE = registry.counter('greenmst_packet_in_parse_total', 'Packet-in messages by parser used', 'parser')
+
+ETHERNET_HEADER = struct.Struct('!6s6sH')
+VLAN_TYPES = frozenset([ether.ETH_TYPE_8021Q, ether.ETH_TYPE_8021AD])
+
+def parse_ethernet(data):
+    # Destination and source (as 6-byte strings) and ethertype of a frame:
+    # only the Ethernet header is decoded, unless the frame is VLAN tagged
+    try:
+        dst, src, ethertype = ETHERNET_HEADER.unpack_from(data)
+    except struct.error:
+        PACKET_IN_PARSE.inc('short')
+        return None
+
+    if ethertype not in VLAN_TYPES:
+        PACKET_IN_PARSE.inc('fast')
+        return dst, src, ethertype
+
+    PACKET_IN_PARSE.inc('full')
+    tags = packet.Packet(data).get_protocols(vlan.vlan)
+    if tags:
+        ethertype = tags[-1].ethertype
+    return dst, src, ethertype
 
 class SimpleSwitch(app_manager.RyuApp):
     OFP_VERSIONS = [ofproto_v1_0.OFP_VERSION]
+    # Seconds after which an idle MAC address is forgotten (0 never), and
+    # maximum number of MAC addresses learnt per switch
+    mac_idle_timeout = 300
+    mac_table_size = 4096
 
     def __init__(self, *args, **kwargs):
         super(SimpleSwitch, self).__init__(*args, **kwargs)
-        self.mac_to_port = {}
+        self.mac_to_port = MacTable(self.mac_table_size, self.mac_idle_timeout)
 
     @classmethod
     def add_flow(cls, datapath, in_port, dst, actions):
+        # dst is the destination MAC address as a 6-byte string
         ofproto = datapath.ofproto
 
         match = datapath.ofproto_parser.OFPMatch(
-            in_port=in_port, dl_dst=haddr_to_bin(dst))
+            in_port=in_port, dl_dst=dst)
 
         mod = datapath.ofproto_parser.OFPFlowMod(
             datapath=datapath, match=match, cookie=0,
@@ -54,29 +86,30 @@ class SimpleSwitch(app_manager.RyuApp):
         datapath.send_msg(mod)
 
     @set_ev_cls(ofp_event.EventOFPPacketIn, MAIN_DISPATCHER)
+    @timed(PACKET_IN_TIME)
     def _packet_in_handler(self, ev):
         msg = ev.msg
         datapath = msg.datapath
         ofproto = datapath.ofproto
+        PACKET_IN.inc(datapath.id)
 
-        pkt = packet.Packet(msg.data)
-        eth = pkt.get_protocol(ethernet.ethernet)
-
-        if eth.ethertype == ether.ETH_TYPE_LLDP:
+        header = parse_ethernet(msg.data)
+        if header is None:
             return
 
-        dst = eth.dst
-        src = eth.src
+        dst, src, ethertype = header
+        if ethertype == ether.ETH_TYPE_LLDP:
+            return
 
         dpid = datapath.id
-        self.mac_to_port.setdefault(dpid, {})
+        table = self.mac_to_port.switch(dpid)
+        now = time.time()
 
         # learn a mac address to avoid FLOOD next time.
-        self.mac_to_port[dpid][src] = msg.in_port
+        table.learn(src, msg.in_port, now)
 
-        if dst in self.mac_to_port[dpid]:
-            out_port = self.mac_to_port[dpid][dst]
-        else:
+        out_port = table.lookup(dst, now)
+        if out_port is None:
             out_port = ofproto.OFPP_FLOOD
 
         actions = [datapath.ofproto_parser.OFPActionOutput(out_port)]
@@ -104,4 +137,4 @@ class SimpleSwitch(app_manager.RyuApp):
         dpid = datapath.id
         ofproto = msg.datapath.ofproto
         if reason == ofproto.OFPPR_DELETE or reason == ofproto.OFPPR_MODIFY:
-            self.mac_to_port[dpid] = {mac:port for mac,port in self.mac_to_port[dpid].items() if port != port_no}
+            self.mac_to_port.purge_port(dpid, port_no)
@@ -0,0 +1,81 @@
+# Copyright (C) 2014 Andrea Biancini <andrea.biancini@gmail.com>.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+__author__ = 'Andrea Biancini <andrea.biancini@gmail.com>'
+
+"""
+Immutable, versioned copies of the controller state served by the REST
+API. Each collection is serialized at most once per snapshot.
+"""
+
+import json
+import os
+
+def _edge_order(link):
+    return link.key
+
+class TopologySnapshot(object):
+    # Distinguishes the versions of different controller runs in the ETags
+    instance = os.urandom(4).encode('hex')
+
+    def __init__(self, version, key, topo_edges, mst_edges, redundant_edges, costs):
+        self.version = version
+        self.key = key
+        self.etag = '%s-%s' % (self.instance, version)
+        self.collections = {
+            'topoedges': tuple(sorted(topo_edges, key=_edge_order)),
+            'mstedges': tuple(sorted(mst_edges, key=_edge_order)),
+            'redundantedges': tuple(sorted(redundant_edges, key=_edge_order)),
+            'topocosts': dict(costs)
+        }
+        self.bodies = {}
+        self.indexes = {}
+
+    def get(self, name):
+        return self.collections[name]
+
+    def edges(self, name, dpid=None):
+        collection = self.collections[name]
+        if dpid is None:
+            return collection
+
+        # Per switch index of the collection, built once per snapshot
+        index = self.indexes.get(name)
+        if index is None:
+            index = {}
+            for link in collection:
+                index.setdefault(link.src, []).append(link)
+                if link.dst != link.src:
+                    index.setdefault(link.dst, []).append(link)
+            self.indexes[name] = index
+        return index.get(dpid, ())
+
+    def stream(self, name, dpid=None, chunk_size=1000):
+        # Newline delimited JSON, a chunk of links at a time
+        edges = self.edges(name, dpid)
+        for start in range(0, len(edges), chunk_size):
+            lines = [json.dumps(link.to_json()) for link in edges[start:start + chunk_size]]
+            yield '\n'.join(lines) + '\n'
+
+    def body(self, name):
+        body = self.bodies.get(name)
+        if body is None:
+            collection = self.collections[name]
+            if isinstance(collection, dict):
+                body = json.dumps(collection)
+            else:
+                body = json.dumps([link.to_json() for link in collection])
+            self.bodies[name] = body
+        return body
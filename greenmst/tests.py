@@ -15,17 +15,32 @@
 
 __author__ = 'Andrea Biancini <andrea.biancini@gmail.com>'
 
+import os
 import random
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
 import ConfigParser
-from nose.tools import assert_equals, assert_true
+from nose.tools import assert_equals, assert_true, raises
 from mock import Mock, call, patch
 from link import Link
-from controller import Controller
-from simple_switch import SimpleSwitch
+from controller import Controller, INCREMENTAL_UPDATE_TIME, UPDATE_LINKS_TIME
+from simple_switch import SimpleSwitch, parse_ethernet
 from topology_costs import TopologyCosts
+from topology import TopologyIndex
+from port_dispatcher import PortModDispatcher
+from datapath_cache import DatapathCache
+from port_states import PortStateTable
+from background import BackgroundSolver
+from journal import TopologyJournal
+from mac_table import MacTable, SwitchMacTable
 from ryu.ofproto import ofproto_v1_0, ofproto_v1_0_parser, ether
+from ryu.lib.mac import haddr_to_bin
 from ryu.lib.packet.ethernet import ethernet
-from ryu.lib.packet import bfd
+from ryu.lib.packet import bfd, vlan
+from ryu.lib.packet.packet import Packet
 
 config = ConfigParser.RawConfigParser()
 config.read('tests.cfg')
@@ -121,11 +136,11 @@ def test_find_redundant_edges():
 @patch('ryu.topology.api.get_switch')
 def test_mod_port_open(mock_get_switch):
     # arrange
-    mock_datapath = Mock(ofproto=ofproto_v1_0, ofproto_parser=ofproto_v1_0_parser)
+    mock_datapath = Mock(id=1, ofproto=ofproto_v1_0, ofproto_parser=ofproto_v1_0_parser)
 
     ports = []
     for i in range(4):
-        port = Mock()
+        port = Mock(dpid=1, port_no=i + 1)
         port.hw_addr = random_mac()
         ports.append(port)
 
@@ -143,11 +158,11 @@ def test_mod_port_open(mock_get_switch):
 @patch('ryu.topology.api.get_switch')
 def test_mod_port_close(mock_get_switch):
     # arrange
-    mock_datapath = Mock(ofproto=ofproto_v1_0, ofproto_parser=ofproto_v1_0_parser)
+    mock_datapath = Mock(id=1, ofproto=ofproto_v1_0, ofproto_parser=ofproto_v1_0_parser)
 
     ports = []
     for i in range(4):
-        port = Mock()
+        port = Mock(dpid=1, port_no=i + 1)
         port.hw_addr = random_mac()
         ports.append(port)
 
@@ -172,13 +187,15 @@ def test_event_link_add():
 
     controller = Controller()
     controller.update_links = Mock()
+    controller.update_edges = Mock()
 
     # act
     controller._event_link_add_handler(event)
 
     # assert
-    assert_equals([Link(src=1, src_port=1, dst=2, dst_port=1)], controller.topo_edges)
-    assert_equals(1, controller.update_links.call_count)
+    assert_equals(set([Link(src=1, src_port=1, dst=2, dst_port=1)]), controller.topo_edges)
+    assert_equals(0, controller.update_links.call_count)
+    assert_equals(1, controller.update_edges.call_count)
 
 def test_event_link_add_inverse():
     # arrange
@@ -190,14 +207,16 @@ def test_event_link_add_inverse():
 
     controller = Controller()
     controller.update_links = Mock()
-    controller.topo_edges = [Link(src=2, src_port=1, dst=1, dst_port=1)]
+    controller.update_edges = Mock()
+    controller.topo_edges = set([Link(src=2, src_port=1, dst=1, dst_port=1)])
 
     # act
     controller._event_link_add_handler(event)
 
     # assert
-    assert_equals([Link(src=2, src_port=1, dst=1, dst_port=1)], controller.topo_edges)
+    assert_equals(set([Link(src=2, src_port=1, dst=1, dst_port=1)]), controller.topo_edges)
     assert_equals(0, controller.update_links.call_count)
+    assert_equals(0, controller.update_edges.call_count)
 
 def test_event_link_delete():
     # arrange
@@ -209,14 +228,16 @@ def test_event_link_delete():
 
     controller = Controller()
     controller.update_links = Mock()
-    controller.topo_edges = [Link(src=1, src_port=1, dst=2, dst_port=1)]
+    controller.update_edges = Mock()
+    controller.topo_edges = set([Link(src=1, src_port=1, dst=2, dst_port=1)])
 
     # act
     controller._event_link_delete_handler(event)
 
     # assert
-    assert_equals([], controller.topo_edges)
-    assert_equals(1, controller.update_links.call_count)
+    assert_equals(set(), controller.topo_edges)
+    assert_equals(0, controller.update_links.call_count)
+    assert_equals(1, controller.update_edges.call_count)
 
 def test_event_link_delete_inverse():
     # arrange
@@ -228,14 +249,16 @@ def test_event_link_delete_inverse():
 
     controller = Controller()
     controller.update_links = Mock()
-    controller.topo_edges = [Link(src=2, src_port=1, dst=1, dst_port=1)]
+    controller.update_edges = Mock()
+    controller.topo_edges = set([Link(src=2, src_port=1, dst=1, dst_port=1)])
 
     # act
     controller._event_link_delete_handler(event)
 
     # assert
-    assert_equals([], controller.topo_edges)
-    assert_equals(1, controller.update_links.call_count)
+    assert_equals(set(), controller.topo_edges)
+    assert_equals(0, controller.update_links.call_count)
+    assert_equals(1, controller.update_edges.call_count)
 
 def test_event_link_delete_none():
     # arrange
@@ -247,14 +270,16 @@ def test_event_link_delete_none():
 
     controller = Controller()
     controller.update_links = Mock()
-    controller.topo_edges = [Link(src=1, src_port=2, dst=3, dst_port=1)]
+    controller.update_edges = Mock()
+    controller.topo_edges = set([Link(src=1, src_port=2, dst=3, dst_port=1)])
 
     # act
     controller._event_link_delete_handler(event)
 
     # assert
-    assert_equals([Link(src=1, src_port=2, dst=3, dst_port=1)], controller.topo_edges)
+    assert_equals(set([Link(src=1, src_port=2, dst=3, dst_port=1)]), controller.topo_edges)
     assert_equals(0, controller.update_links.call_count)
+    assert_equals(0, controller.update_edges.call_count)
 
 def test_set_costs():
     # arrange
@@ -269,7 +294,7 @@ def test_set_costs():
     # assert
     topo_costs = TopologyCosts()
     assert_equals(costs, topo_costs.costs)
-    assert_equals(1, controller.update_links.call_count)
+    assert_equals(0, controller.update_links.call_count)
 
 def test_set_cost():
     # arrange
@@ -440,7 +465,7 @@ def test_packet_in_noflood():
     assert_equals(1, controller.add_flow.call_count)
     assert_equals(mock_datapath, controller.add_flow.call_args[0][0])
     assert_equals(in_port, controller.add_flow.call_args[0][1])
-    assert_equals(dst, controller.add_flow.call_args[0][2])
+    assert_equals(haddr_to_bin(dst), controller.add_flow.call_args[0][2])
     assert_equals(1, len(controller.add_flow.call_args[0][3]))
     assert_equals(out_port, controller.add_flow.call_args[0][3][0].port)
     assert_equals(1, mock_datapath.send_msg.call_count)
@@ -553,3 +578,914 @@ def test_port_status_handler_add():
     # assert
     assert_true(1 in controller.mac_to_port)
     assert_equals({dst: out_port}, controller.mac_to_port[1])
+
+def test_event_link_add_incremental():
+    # arrange
+    links = []
+    links.append({'src': { 'dpid': 1, 'port_no': 1 }, 'dst': {'dpid': 2, 'port_no': 1 }})
+    links.append({'src': { 'dpid': 2, 'port_no': 2 }, 'dst': {'dpid': 3, 'port_no': 1 }})
+    links.append({'src': { 'dpid': 1, 'port_no': 2 }, 'dst': {'dpid': 3, 'port_no': 2 }})
+    TopologyCosts().costs = { '1,2': 1, '2,3': 2, '1,3': 3 }
+
+    controller = Controller()
+    controller.mod_port = Mock()
+
+    # act
+    for link_dict in links:
+        link = Mock()
+        link.to_dict.return_value = link_dict
+        controller._event_link_add_handler(Mock(link=link))
+
+    # assert
+    assert_equals(set([Link(src=1, src_port=2, dst=3, dst_port=2)]), controller.redundant_edges)
+    assert_equals(2, len(controller.mst_edges))
+    controller.mod_port.assert_has_calls([call(1, 2, False), call(3, 2, False)], any_order=True)
+    assert_equals(2, controller.mod_port.call_count)
+
+def test_event_link_delete_incremental():
+    # arrange
+    links = []
+    links.append({'src': { 'dpid': 1, 'port_no': 1 }, 'dst': {'dpid': 2, 'port_no': 1 }})
+    links.append({'src': { 'dpid': 2, 'port_no': 2 }, 'dst': {'dpid': 3, 'port_no': 1 }})
+    links.append({'src': { 'dpid': 1, 'port_no': 2 }, 'dst': {'dpid': 3, 'port_no': 2 }})
+    TopologyCosts().costs = { '1,2': 1, '2,3': 2, '1,3': 3 }
+
+    controller = Controller()
+    controller.mod_port = Mock()
+    for link_dict in links:
+        link = Mock()
+        link.to_dict.return_value = link_dict
+        controller._event_link_add_handler(Mock(link=link))
+    controller.mod_port.reset_mock()
+
+    # act
+    link = Mock()
+    link.to_dict.return_value = links[1]
+    controller._event_link_delete_handler(Mock(link=link))
+
+    # assert
+    assert_equals(set(), controller.redundant_edges)
+    assert_equals(2, len(controller.mst_edges))
+    controller.mod_port.assert_has_calls([call(1, 2, True), call(3, 2, True)], any_order=True)
+    assert_equals(2, controller.mod_port.call_count)
+
+def test_link_inverse_hash():
+    # arrange
+    link = Link(src=1, src_port=2, dst=3, dst_port=4, cost=1)
+
+    # act
+    inverse = link.link_inverse()
+
+    # assert
+    assert_equals(3, inverse.src)
+    assert_equals(4, inverse.src_port)
+    assert_equals(link, inverse)
+    assert_equals(hash(link), hash(inverse))
+    assert_equals(1, len(set([link, inverse])))
+
+def test_link_ports_in_key():
+    # arrange
+    link = Link(src=1, src_port=1, dst=2, dst_port=1, cost=1)
+    parallel = Link(src=1, src_port=2, dst=2, dst_port=2, cost=1)
+
+    # act
+    result = set([link, parallel])
+
+    # assert
+    assert_true(link != parallel)
+    assert_equals(2, len(result))
+
+@raises(AttributeError)
+def test_link_immutable():
+    # arrange
+    link = Link(src=1, src_port=1, dst=2, dst_port=1, cost=1)
+
+    # act
+    link.cost = 10
+
+    # assert
+
+def test_topology_index():
+    # arrange
+    index = TopologyIndex()
+    link_12 = Link(src=1, src_port=1, dst=2, dst_port=1, cost=1)
+    link_13 = Link(src=1, src_port=2, dst=3, dst_port=1, cost=1)
+
+    # act
+    index.add(link_12)
+    index.add(link_13)
+
+    # assert
+    assert_equals(link_12, index.get(2, 1))
+    assert_equals(link_13, index.get(1, 2))
+    assert_equals(set([link_12, link_13]), index.links(1))
+    assert_equals(link_12, index.remove(link_12.link_inverse().key))
+    assert_equals(None, index.get(1, 1))
+    assert_equals(set([link_13]), index.links(1))
+    assert_equals(0, len(index.links(2)))
+
+def test_topology_index_evicts_stale():
+    # arrange
+    index = TopologyIndex()
+    stale = Link(src=1, src_port=1, dst=2, dst_port=1, cost=1)
+    index.add(stale)
+
+    # act
+    evicted = index.add(Link(src=1, src_port=1, dst=3, dst_port=1, cost=1))
+
+    # assert
+    assert_equals([stale], evicted)
+    assert_equals(1, len(index))
+    assert_equals(None, index.get(2, 1))
+
+def test_event_switch_leave():
+    # arrange
+    topo_edges = []
+    topo_edges.append(Link(src=1, src_port=1, dst=2, dst_port=1, cost=1))
+    topo_edges.append(Link(src=1, src_port=2, dst=3, dst_port=1, cost=4))
+    topo_edges.append(Link(src=1, src_port=3, dst=4, dst_port=1, cost=2))
+    topo_edges.append(Link(src=2, src_port=2, dst=3, dst_port=2, cost=3))
+    topo_edges.append(Link(src=2, src_port=3, dst=4, dst_port=2, cost=4))
+    topo_edges.append(Link(src=3, src_port=3, dst=4, dst_port=3, cost=1))
+
+    controller = Controller()
+    controller.mod_port = Mock()
+    controller.topo_edges = topo_edges
+    controller.update_links()
+    controller.mod_port.reset_mock()
+    event = Mock(switch=Mock(dp=Mock(id=1)))
+
+    # act
+    controller._event_switch_leave_handler(event)
+
+    # assert
+    assert_equals(set(topo_edges[3:]), controller.topo_edges)
+    assert_equals(set([topo_edges[3], topo_edges[5]]), controller.mst_edges)
+    assert_equals(set([topo_edges[4]]), controller.redundant_edges)
+    controller.mod_port.assert_has_calls([call(3, 1, True), call(2, 2, True), call(3, 2, True)], any_order=True)
+    assert_equals(3, controller.mod_port.call_count)
+
+def test_event_port_delete():
+    # arrange
+    controller = Controller()
+    controller.update_edges = Mock()
+    controller.topo_edges = set([Link(src=1, src_port=1, dst=2, dst_port=1, cost=1)])
+    event = Mock(port=Mock(dpid=2, port_no=1))
+
+    # act
+    controller._event_port_delete_handler(event)
+
+    # assert
+    assert_equals(set(), controller.topo_edges)
+    assert_equals(1, controller.update_edges.call_count)
+
+def test_event_port_modify_up():
+    # arrange
+    controller = Controller()
+    controller.update_edges = Mock()
+    controller.topo_edges = set([Link(src=1, src_port=1, dst=2, dst_port=1, cost=1)])
+    port = Mock(dpid=2, port_no=1)
+    port.is_down.return_value = False
+
+    # act
+    controller._event_port_modify_handler(Mock(port=port))
+
+    # assert
+    assert_equals(1, len(controller.topo_edges))
+    assert_equals(0, controller.update_edges.call_count)
+
+def test_event_coalescing_window():
+    # arrange
+    links = []
+    links.append({'src': { 'dpid': 1, 'port_no': 1 }, 'dst': {'dpid': 2, 'port_no': 1 }})
+    links.append({'src': { 'dpid': 2, 'port_no': 2 }, 'dst': {'dpid': 3, 'port_no': 1 }})
+    links.append({'src': { 'dpid': 1, 'port_no': 2 }, 'dst': {'dpid': 3, 'port_no': 2 }})
+    TopologyCosts().costs = { '1,2': 1, '2,3': 2, '1,3': 3 }
+
+    controller = Controller()
+    controller.mod_port = Mock()
+    controller.update_edges = Mock(wraps=controller.update_edges)
+    controller.coalescer.window = 60
+
+    # act
+    for link_dict in links:
+        link = Mock()
+        link.to_dict.return_value = link_dict
+        controller._event_link_add_handler(Mock(link=link))
+    pending = controller.coalescer.pending_events
+    controller.coalescer.flush()
+
+    # assert
+    assert_equals(3, pending)
+    assert_equals(1, controller.update_edges.call_count)
+    assert_equals(set([Link(src=1, src_port=2, dst=3, dst_port=2)]), controller.redundant_edges)
+    assert_equals(2, controller.mod_port.call_count)
+
+    stats = controller.coalescer.stats()
+    assert_equals(1, stats['recomputes'])
+    assert_equals(3, stats['events'])
+    assert_equals(3, stats['maxBatch'])
+    assert_equals(0, stats['pending'])
+
+def test_event_coalescing_add_delete():
+    # arrange
+    link = Mock()
+    link.to_dict.return_value = {'src': { 'dpid': 1, 'port_no': 1 }, 'dst': {'dpid': 2, 'port_no': 1 }}
+    event = Mock(link=link)
+
+    controller = Controller()
+    controller.mod_port = Mock()
+    controller.coalescer.window = 60
+
+    # act
+    controller._event_link_add_handler(event)
+    controller._event_link_delete_handler(event)
+    controller.coalescer.flush()
+
+    # assert
+    assert_equals(set(), controller.topo_edges)
+    assert_equals(set(), controller.mst_edges)
+    assert_equals(0, len(controller.mst))
+    assert_equals(0, controller.mod_port.call_count)
+    assert_equals(2, controller.coalescer.last_batch)
+
+def test_event_coalescing_max_events():
+    # arrange
+    controller = Controller()
+    controller.apply_changes = Mock()
+    controller.coalescer.apply_changes = controller.apply_changes
+    controller.coalescer.window = 60
+    controller.coalescer.max_events = 2
+
+    # act
+    controller.coalescer.add([Link(src=1, src_port=1, dst=2, dst_port=1, cost=1)])
+    calls_first = controller.apply_changes.call_count
+    controller.coalescer.add([Link(src=2, src_port=2, dst=3, dst_port=1, cost=1)])
+
+    # assert
+    assert_equals(0, calls_first)
+    assert_equals(1, controller.apply_changes.call_count)
+    assert_equals(2, len(controller.apply_changes.call_args[0][0]))
+
+def mock_datapath_with_xid(dpid):
+    datapath = Mock(id=dpid, ofproto=ofproto_v1_0, ofproto_parser=ofproto_v1_0_parser)
+    xids = iter(range(1, 100))
+    datapath.set_xid.side_effect = lambda msg: msg.set_xid(next(xids))
+    return datapath
+
+def test_port_dispatcher_batch():
+    # arrange
+    clock = Mock(side_effect=[10.0, 10.5, 10.75])
+    dispatcher = PortModDispatcher(clock=clock)
+    datapath1 = mock_datapath_with_xid(1)
+    datapath2 = mock_datapath_with_xid(2)
+
+    # act
+    with dispatcher.batch():
+        dispatcher.send(datapath1, 'mod1')
+        dispatcher.send(datapath2, 'mod2')
+        dispatcher.send(datapath1, 'mod3')
+        sent_in_batch = datapath1.send_msg.call_count + datapath2.send_msg.call_count
+
+    # assert
+    assert_equals(0, sent_in_batch)
+    assert_equals(['mod1', 'mod3'], [args[0][0] for args in datapath1.send_msg.call_args_list[:2]])
+    assert_true(isinstance(datapath1.send_msg.call_args[0][0], ofproto_v1_0_parser.OFPBarrierRequest))
+    assert_true(isinstance(datapath2.send_msg.call_args[0][0], ofproto_v1_0_parser.OFPBarrierRequest))
+    assert_true(not dispatcher.converged)
+
+    assert_equals(0.5, dispatcher.confirm(1, 1))
+    assert_equals(None, dispatcher.confirm(1, 1))
+    assert_equals(0.75, dispatcher.confirm(2, 1))
+    assert_true(dispatcher.converged)
+    assert_equals(0.75, dispatcher.last_convergence)
+
+    stats = dispatcher.to_json()['switches']
+    assert_equals(2, stats['1']['portMods'])
+    assert_equals(1, stats['1']['batches'])
+    assert_equals(0.5, stats['1']['lastLatency'])
+
+def test_port_dispatcher_unbatched():
+    # arrange
+    dispatcher = PortModDispatcher()
+    datapath = mock_datapath_with_xid(1)
+
+    # act
+    dispatcher.send(datapath, 'mod')
+
+    # assert
+    assert_equals(1, datapath.send_msg.call_count)
+    assert_true(dispatcher.converged)
+
+@patch('ryu.topology.api.get_switch')
+def test_update_links_barrier(mock_get_switch):
+    # arrange
+    datapaths = {}
+    def get_switch(app, dpid):
+        ports = [Mock(dpid=dpid, port_no=i + 1, hw_addr=random_mac()) for i in range(4)]
+        return [Mock(dp=datapaths.setdefault(dpid, mock_datapath_with_xid(dpid)), ports=ports)]
+    mock_get_switch.side_effect = get_switch
+
+    controller = Controller()
+    controller.topo_edges = [Link(src=1, src_port=1, dst=2, dst_port=1, cost=1),
+                             Link(src=2, src_port=2, dst=3, dst_port=1, cost=2),
+                             Link(src=1, src_port=2, dst=3, dst_port=2, cost=3)]
+
+    # act
+    controller.update_links()
+
+    # assert
+    for dpid in (1, 3):
+        messages = [args[0][0] for args in datapaths[dpid].send_msg.call_args_list]
+        assert_equals(2, len(messages))
+        assert_true(isinstance(messages[0], ofproto_v1_0_parser.OFPPortMod))
+        assert_true(isinstance(messages[1], ofproto_v1_0_parser.OFPBarrierRequest))
+    assert_true(2 not in datapaths)
+    assert_equals(2, len(controller.port_dispatcher.outstanding))
+
+@patch('ryu.topology.api.get_switch')
+def test_mod_port_cached(mock_get_switch):
+    # arrange
+    mock_datapath = Mock(id=1, ofproto=ofproto_v1_0, ofproto_parser=ofproto_v1_0_parser)
+    ports = [Mock(dpid=1, port_no=port_no, hw_addr=random_mac()) for port_no in (1, 7, 42)]
+    controller = Controller()
+    controller._event_switch_enter_handler(Mock(switch=Mock(dp=mock_datapath, ports=ports)))
+
+    # act
+    controller.mod_port(1, 42, False)
+    controller.mod_port(1, 7, True)
+
+    # assert
+    assert_equals(0, mock_get_switch.call_count)
+    assert_equals(2, mock_datapath.send_msg.call_count)
+    verify_port_mod(mock_datapath.send_msg.call_args_list[0][0][0], ports[2].hw_addr, 42, 63)
+    verify_port_mod(mock_datapath.send_msg.call_args_list[1][0][0], ports[1].hw_addr, 7, 0)
+
+@patch('ryu.topology.api.get_switch')
+def test_mod_port_switch_left(mock_get_switch):
+    # arrange
+    mock_datapath = Mock(id=1, ofproto=ofproto_v1_0, ofproto_parser=ofproto_v1_0_parser)
+    ports = [Mock(dpid=1, port_no=1, hw_addr=random_mac())]
+    switch = Mock(dp=mock_datapath, ports=ports)
+    mock_get_switch.return_value = []
+    controller = Controller()
+    controller._event_switch_enter_handler(Mock(switch=switch))
+    controller._event_switch_leave_handler(Mock(switch=switch))
+
+    # act
+    controller.mod_port(1, 1, False)
+
+    # assert
+    assert_equals(1, mock_get_switch.call_count)
+    assert_equals(0, mock_datapath.send_msg.call_count)
+
+def test_datapath_cache_ports():
+    # arrange
+    cache = DatapathCache()
+    mock_datapath = Mock(id=1)
+    port = Mock(dpid=1, port_no=3, hw_addr='00:00:00:00:00:03')
+
+    # act
+    cache.add_switch(Mock(dp=mock_datapath, ports=[]))
+    cache.add_port(port)
+    found = cache.lookup(1, 3)
+    cache.remove_port(port)
+
+    # assert
+    assert_equals((mock_datapath, '00:00:00:00:00:03'), found)
+    assert_equals(None, cache.lookup(1, 3))
+    assert_true(1 in cache)
+
+def test_update_links_reopen_all():
+    # arrange
+    topo_edges = []
+    topo_edges.append(Link(src=1, src_port=1, dst=2, dst_port=1, cost=1))
+    topo_edges.append(Link(src=2, src_port=2, dst=3, dst_port=1, cost=2))
+    topo_edges.append(Link(src=1, src_port=2, dst=3, dst_port=2, cost=3))
+
+    controller = Controller()
+    controller.mod_port = Mock()
+    controller.topo_edges = topo_edges
+    controller.update_links()
+    controller.mod_port.reset_mock()
+
+    # act
+    controller.topo_edges = topo_edges[:2]
+    controller.update_links()
+
+    # assert
+    assert_equals(set(), controller.redundant_edges)
+    controller.mod_port.assert_has_calls([call(1, 2, True), call(3, 2, True)], any_order=True)
+    assert_equals(2, controller.mod_port.call_count)
+
+def test_update_links_no_changes():
+    # arrange
+    topo_edges = []
+    topo_edges.append(Link(src=1, src_port=1, dst=2, dst_port=1, cost=1))
+    topo_edges.append(Link(src=2, src_port=2, dst=3, dst_port=1, cost=2))
+    topo_edges.append(Link(src=1, src_port=2, dst=3, dst_port=2, cost=3))
+
+    controller = Controller()
+    controller.mod_port = Mock()
+    controller.topo_edges = topo_edges
+    controller.update_links()
+    controller.mod_port.reset_mock()
+
+    # act
+    controller.update_links()
+
+    # assert
+    assert_equals(0, controller.mod_port.call_count)
+
+def test_port_state_table():
+    # arrange
+    table = PortStateTable()
+    link_12 = Link(src=1, src_port=1, dst=2, dst_port=1, cost=1)
+    link_13 = Link(src=1, src_port=2, dst=3, dst_port=1, cost=1)
+
+    # act
+    table.close(link_12)
+    table.close(link_13)
+    first = table.changes()
+    for endpoint, open in first:
+        table.mark_applied(endpoint, open)
+    table.open(link_12)
+    table.close(link_13)
+    second = table.changes()
+
+    # assert
+    assert_equals([((1, 1), False), ((1, 2), False), ((2, 1), False), ((3, 1), False)], first)
+    assert_equals([((1, 1), True), ((2, 1), True)], second)
+    assert_true(table.is_closed(3, 1))
+    assert_true(not table.is_closed(2, 1))
+
+def test_get_cost_symmetric():
+    # arrange
+    topo_costs = TopologyCosts()
+    topo_costs.costs = {'2,1': 7}
+
+    # act
+    result = topo_costs.get_cost(1, 2)
+    result_inverse = topo_costs.get_cost(2, 1)
+
+    # assert
+    assert_equals(7, result)
+    assert_equals(7, result_inverse)
+    assert_equals({'1,2': 7}, topo_costs.costs)
+
+def test_get_cost_default_not_stored():
+    # arrange
+    topo_costs = TopologyCosts()
+    topo_costs.costs = {}
+
+    # act
+    topo_costs.get_cost(3, 4)
+
+    # assert
+    assert_equals({}, topo_costs.costs)
+    assert_equals({}, topo_costs.store)
+
+def test_set_costs_list():
+    # arrange
+    topo_costs = TopologyCosts()
+
+    # act
+    topo_costs.costs = [{'1,2': 10, '1,3': 40}, {'3,4': 5.0}]
+
+    # assert
+    assert_equals({'1,2': 10, '1,3': 40, '3,4': 5}, topo_costs.costs)
+    assert_equals(40, topo_costs.get_cost(3, 1))
+
+@raises(ValueError)
+def test_set_costs_invalid():
+    # arrange
+    topo_costs = TopologyCosts()
+    topo_costs.costs = {'1,2': 10}
+    version = topo_costs.version
+
+    # act
+    try:
+        topo_costs.costs = {'1,3': 5, '1,2,3': 7}
+    finally:
+        # assert
+        assert_equals({'1,2': 10}, topo_costs.costs)
+        assert_equals(version, topo_costs.version)
+
+def test_set_costs_recompute():
+    # arrange
+    topo_edges = []
+    topo_edges.append(Link(src=1, src_port=1, dst=2, dst_port=1, cost=1))
+    topo_edges.append(Link(src=2, src_port=2, dst=3, dst_port=1, cost=2))
+    topo_edges.append(Link(src=1, src_port=2, dst=3, dst_port=2, cost=3))
+    TopologyCosts().costs = { '1,2': 1, '2,3': 2, '1,3': 3 }
+
+    controller = Controller()
+    controller.mod_port = Mock()
+    controller.topo_edges = topo_edges
+    controller.update_links()
+    controller.mod_port.reset_mock()
+    controller.update_links = Mock()
+
+    # act
+    changed = controller.set_costs({ '1,2': 1, '2,3': 10, '1,3': 3 })
+
+    # assert
+    assert_equals([Link(src=2, src_port=2, dst=3, dst_port=1)], changed)
+    assert_equals(10, changed[0].cost)
+    assert_equals(0, controller.update_links.call_count)
+    assert_equals(set([topo_edges[0], topo_edges[2]]), controller.mst_edges)
+    assert_equals(set([topo_edges[1]]), controller.redundant_edges)
+    assert_equals(10, list(controller.redundant_edges)[0].cost)
+    assert_equals(10, controller.topology.get(3, 1).cost)
+    controller.mod_port.assert_has_calls([call(1, 2, True), call(3, 2, True), call(2, 2, False), call(3, 1, False)], any_order=True)
+    assert_equals(4, controller.mod_port.call_count)
+
+def test_update_costs_unchanged():
+    # arrange
+    TopologyCosts().costs = { '1,2': 1 }
+    controller = Controller()
+    controller.topo_edges = [Link(src=1, src_port=1, dst=2, dst_port=1)]
+    controller.apply_changes = Mock()
+    controller.coalescer.apply_changes = controller.apply_changes
+
+    # act
+    changed = controller.update_costs([(2, 1, 1)])
+
+    # assert
+    assert_equals([], changed)
+    assert_equals(0, controller.apply_changes.call_count)
+
+def test_background_update_links():
+    # arrange
+    topo_edges = []
+    topo_edges.append(Link(src=1, src_port=1, dst=2, dst_port=1, cost=1))
+    topo_edges.append(Link(src=2, src_port=2, dst=3, dst_port=1, cost=2))
+    topo_edges.append(Link(src=1, src_port=2, dst=3, dst_port=2, cost=3))
+
+    controller = Controller()
+    controller.mod_port = Mock()
+    controller.topo_edges = topo_edges
+    controller.background = BackgroundSolver(controller.mst_solver.perform, controller.topology_snapshot,
+                                             controller.apply_tree, threaded=False)
+
+    # act
+    with patch('ryu.lib.hub.spawn') as mock_spawn:
+        controller.update_links()
+        pending = controller.redundant_edges.copy()
+        mock_spawn.call_args[0][0]()
+
+    # assert
+    assert_equals(set(), pending)
+    assert_equals(1, mock_spawn.call_count)
+    assert_equals(set([topo_edges[2]]), controller.redundant_edges)
+    assert_equals(set([topo_edges[0], topo_edges[1]]), controller.mst_edges)
+    assert_equals(2, len(controller.mst))
+    assert_equals(2, controller.mod_port.call_count)
+    assert_equals(1, controller.background.computations)
+    assert_true(not controller.background.running)
+
+def test_background_drops_stale_result():
+    # arrange
+    topo_edges = []
+    topo_edges.append(Link(src=1, src_port=1, dst=2, dst_port=1, cost=1))
+    topo_edges.append(Link(src=2, src_port=2, dst=3, dst_port=1, cost=2))
+    topo_edges.append(Link(src=1, src_port=2, dst=3, dst_port=2, cost=3))
+    stale_tree = set(topo_edges[:2])
+
+    controller = Controller()
+    controller.mod_port = Mock()
+    controller.topo_edges = topo_edges
+
+    def solve(edges):
+        # A link goes away while the first tree is being computed
+        if solve.calls == 0:
+            controller.topology.remove(topo_edges[1].key)
+        solve.calls += 1
+        return controller.mst_solver.perform(edges)
+    solve.calls = 0
+
+    controller.background = BackgroundSolver(solve, controller.topology_snapshot, controller.apply_tree, threaded=False)
+    controller.apply_tree = Mock(wraps=controller.apply_tree)
+    controller.background.apply_tree = controller.apply_tree
+
+    # act
+    with patch('ryu.lib.hub.spawn') as mock_spawn:
+        controller.update_links()
+        mock_spawn.call_args[0][0]()
+
+    # assert
+    assert_equals(2, solve.calls)
+    assert_equals(stale_tree, set(controller.apply_tree.call_args_list[0][0][1]))
+    assert_equals(set([topo_edges[0], topo_edges[2]]), controller.mst_edges)
+    assert_equals(set(), controller.redundant_edges)
+    assert_equals(1, controller.background.stale_results)
+    assert_equals(2, controller.background.computations)
+
+def test_background_single_worker():
+    # arrange
+    controller = Controller()
+    controller.background = BackgroundSolver(Mock(return_value=[]), controller.topology_snapshot,
+                                             controller.apply_tree, threaded=False)
+
+    # act
+    with patch('ryu.lib.hub.spawn') as mock_spawn:
+        controller.coalescer.add([Link(src=1, src_port=1, dst=2, dst_port=1, cost=1)])
+        controller.coalescer.add([Link(src=2, src_port=2, dst=3, dst_port=1, cost=1)])
+        mock_spawn.call_args[0][0]()
+
+    # assert
+    assert_equals(1, mock_spawn.call_count)
+    assert_equals(1, controller.background.solve.call_count)
+    assert_equals(0, controller.background.stale_results)
+
+def test_topology_index_version():
+    # arrange
+    link = Link(src=1, src_port=1, dst=2, dst_port=1, cost=1)
+    topology = TopologyIndex()
+
+    # act
+    topology.add(link)
+    added = topology.version
+    topology.replace(link.with_cost(5))
+    replaced = topology.version
+    topology.remove(link.key)
+    version, edges = topology.snapshot()
+
+    # assert
+    assert_equals(1, added)
+    assert_equals(2, replaced)
+    assert_equals(3, version)
+    assert_equals([], edges)
+
+def test_journal_load():
+    # arrange
+    directory = tempfile.mkdtemp()
+    link = Link(src=1, src_port=1, dst=2, dst_port=1, cost=1)
+    journal = TopologyJournal(directory)
+    journal.add(link)
+    journal.add(Link(src=2, src_port=2, dst=3, dst_port=1, cost=1))
+    journal.remove(Link(src=3, src_port=1, dst=2, dst_port=2, cost=1))
+    journal.cost(2, 1, 4)
+    journal.close()
+    with open(journal.journal_path, 'a') as journal_file:
+        journal_file.write('["add", 3, 2')
+
+    # act
+    links, costs = TopologyJournal(directory).load()
+    shutil.rmtree(directory)
+
+    # assert
+    assert_equals([link], links)
+    assert_equals([(1, 2, 4)], costs)
+
+def test_journal_compact():
+    # arrange
+    directory = tempfile.mkdtemp()
+    link = Link(src=1, src_port=1, dst=2, dst_port=1, cost=3)
+    journal = TopologyJournal(directory, snapshot_every=2)
+    journal.add(link)
+    journal.cost(1, 2, 3)
+
+    # act
+    due = journal.due
+    journal.compact([link], [(1, 2, 3)])
+    journal.remove(link)
+    links, costs = TopologyJournal(directory).load()
+    shutil.rmtree(directory)
+
+    # assert
+    assert_true(due)
+    assert_equals(1, journal.records)
+    assert_equals([], links)
+    assert_equals([(1, 2, 3)], costs)
+
+def test_controller_restore():
+    # arrange
+    directory = tempfile.mkdtemp()
+    topo_edges = [Link(src=1, src_port=1, dst=2, dst_port=1, cost=1),
+                  Link(src=2, src_port=2, dst=3, dst_port=1, cost=1),
+                  Link(src=1, src_port=2, dst=3, dst_port=2, cost=5)]
+    journal = TopologyJournal(directory)
+    journal.compact(topo_edges, [(1, 3, 5)])
+    controller = Controller()
+    controller.journal = journal
+    controller.mod_port = Mock(return_value=True)
+    datapath = Mock()
+    datapath.id = 3
+    switch = Mock()
+    switch.dp = datapath
+    switch.ports = []
+
+    # act
+    with patch('ryu.lib.hub.spawn_after') as mock_spawn_after:
+        restored = controller.restore()
+    port_mods = controller.mod_port.call_count
+    controller._event_switch_enter_handler(Mock(switch=switch))
+    link_add = Mock()
+    link_add.to_dict.return_value = {'src': {'dpid': 1, 'port_no': 1}, 'dst': {'dpid': 2, 'port_no': 1}}
+    controller._event_link_add_handler(Mock(link=link_add))
+    controller.expire_restored()
+    shutil.rmtree(directory)
+
+    # assert
+    assert_true(restored)
+    assert_equals(0, port_mods)
+    assert_equals(controller.restore_grace, mock_spawn_after.call_args[0][0])
+    controller.mod_port.assert_any_call(3, 2, False)
+    assert_equals(set([topo_edges[0]]), set(controller.topo_edges))
+    assert_equals(set([topo_edges[0]]), controller.mst_edges)
+
+def test_mac_table_aging():
+    # arrange
+    table = SwitchMacTable(max_entries=10, idle_timeout=300)
+    first = haddr_to_bin(config.get('main', 'MAC_ADDR_1'))
+    second = haddr_to_bin(config.get('main', 'MAC_ADDR_2'))
+
+    # act
+    table.learn(first, 1, now=0)
+    table.learn(second, 2, now=100)
+    table.learn(first, 1, now=200)
+    expired = table.expire(now=450)
+    port = table.lookup(second, now=450)
+
+    # assert
+    assert_equals(1, expired)
+    assert_equals(None, port)
+    assert_equals(1, table.lookup(first, now=450))
+    assert_equals({config.get('main', 'MAC_ADDR_1'): 1}, table)
+
+def test_mac_table_bound():
+    # arrange
+    table = SwitchMacTable(max_entries=2, idle_timeout=0)
+    keys = [struct.pack('!HI', 0x0200, position) for position in range(3)]
+
+    # act
+    table.learn(keys[0], 1, now=0)
+    table.learn(keys[1], 1, now=1)
+    table.learn(keys[0], 1, now=2)
+    table.learn(keys[2], 2, now=3)
+
+    # assert
+    assert_equals(2, len(table))
+    assert_equals(1, table.evicted)
+    assert_equals(None, table.lookup(keys[1]))
+    assert_equals(set([keys[0]]), table.ports[1])
+
+def test_mac_table_purge_port():
+    # arrange
+    macs = MacTable()
+    table = macs.switch(1)
+    first = haddr_to_bin(config.get('main', 'MAC_ADDR_1'))
+    second = haddr_to_bin(config.get('main', 'MAC_ADDR_2'))
+    table.learn(first, 1)
+    table.learn(second, 1)
+    table.learn(second, 2)
+
+    # act
+    purged = macs.purge_port(1, 1)
+
+    # assert
+    assert_equals(1, purged)
+    assert_equals({config.get('main', 'MAC_ADDR_2'): 2}, macs[1])
+    assert_equals({'switches': 1, 'entries': 1, 'expired': 0, 'evicted': 0}, macs.stats())
+
+def test_parse_ethernet():
+    # arrange
+    src = config.get('main', 'MAC_ADDR_1')
+    dst = config.get('main', 'MAC_ADDR_2')
+    frame = ethernet(src=src, dst=dst, ethertype=ether.ETH_TYPE_IP).serialize(None, None)
+    tagged = Packet()
+    tagged.add_protocol(ethernet(src=src, dst=dst, ethertype=ether.ETH_TYPE_8021Q))
+    tagged.add_protocol(vlan.vlan(vid=10, ethertype=ether.ETH_TYPE_ARP))
+    tagged.serialize()
+
+    # act
+    header = parse_ethernet(frame + 'payload')
+    tagged_header = parse_ethernet(tagged.data)
+    short = parse_ethernet(frame[:10])
+
+    # assert
+    assert_equals((haddr_to_bin(dst), haddr_to_bin(src), ether.ETH_TYPE_IP), header)
+    assert_equals((haddr_to_bin(dst), haddr_to_bin(src), ether.ETH_TYPE_ARP), tagged_header)
+    assert_equals(None, short)
+
+def test_packet_in_short_frame():
+    # arrange
+    mock_datapath = Mock(id=1, ofproto=ofproto_v1_0, ofproto_parser=ofproto_v1_0_parser)
+    message = Mock(datapath=mock_datapath, data='\x00' * 10, in_port=1)
+    event = Mock(msg=message)
+
+    controller = SimpleSwitch()
+
+    # act
+    controller._packet_in_handler(event)
+
+    # assert
+    assert_equals(0, mock_datapath.send_msg.call_count)
+    assert_true(1 not in controller.mac_to_port)
+
+def test_options_after_parsing():
+    # arrange
+    directory = tempfile.mkdtemp()
+    config_file = os.path.join(directory, 'greenmst.conf')
+    with open(config_file, 'w') as options:
+        options.write('[DEFAULT]\ngreenmst_algorithm = prim\n')
+    script = ('import ryu.cmd.manager\n'
+              'from ryu import cfg\n'
+              'cfg.CONF(args=["--config-file", %r], project="ryu")\n'
+              'import green_mst\n'
+              'print(cfg.CONF.greenmst_algorithm)\n' % config_file)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    # act
+    process = subprocess.Popen([sys.executable, '-c', script], cwd=root,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    output, errors = process.communicate()
+    shutil.rmtree(directory)
+
+    # assert
+    assert_equals(0, process.returncode, errors)
+    assert_equals('prim', output.strip())
+
+def test_apply_changes_full_update():
+    # arrange
+    topo_edges = [Link(src=1, src_port=1, dst=2, dst_port=1, cost=1),
+                  Link(src=2, src_port=2, dst=3, dst_port=1, cost=1),
+                  Link(src=1, src_port=2, dst=3, dst_port=2, cost=5)]
+    controller = Controller()
+    controller.full_update_min_links = 3
+    controller.mod_port = Mock(return_value=True)
+    controller.mst_solver = Mock()
+    controller.mst_solver.perform.return_value = topo_edges[:2]
+    for link in topo_edges:
+        controller.topology.add(link)
+
+    # act
+    controller.apply_changes(topo_edges)
+    controller.apply_changes(topo_edges[:2])
+
+    # assert
+    assert_equals(1, controller.mst_solver.perform.call_count)
+    assert_equals(set(topo_edges[:2]), controller.mst_edges)
+    assert_equals(set([topo_edges[2]]), controller.redundant_edges)
+
+def test_journal_torn_write():
+    # arrange
+    directory = tempfile.mkdtemp()
+    first = Link(src=1, src_port=1, dst=2, dst_port=1, cost=1)
+    second = Link(src=2, src_port=2, dst=3, dst_port=1, cost=1)
+    journal = TopologyJournal(directory)
+    journal.add(first)
+    journal.close()
+    with open(journal.journal_path, 'a') as journal_file:
+        journal_file.write('["add", 3, 2')
+
+    # act
+    journal = TopologyJournal(directory)
+    journal.load()
+    journal.add(second)
+    journal.close()
+    links, costs = TopologyJournal(directory).load()
+    shutil.rmtree(directory)
+
+    # assert
+    assert_equals(set([first, second]), set(links))
+    assert_equals([], costs)
+
+def test_journal_compact_costs():
+    # arrange
+    directory = tempfile.mkdtemp()
+    TopologyCosts().costs = {}
+    controller = Controller()
+    controller.journal = TopologyJournal(directory, snapshot_every=10)
+
+    # act
+    for cost in range(25):
+        controller.update_costs([(1, 2, cost + 1)])
+    records = controller.journal.records
+    links, costs = TopologyJournal(directory).load()
+    shutil.rmtree(directory)
+
+    # assert
+    assert_equals(5, records)
+    assert_equals([(1, 2, 25)], costs)
+
+def test_apply_changes_timing():
+    # arrange
+    topo_edges = [Link(src=1, src_port=1, dst=2, dst_port=1, cost=1),
+                  Link(src=2, src_port=2, dst=3, dst_port=1, cost=1)]
+    controller = Controller()
+    controller.full_update_min_links = 2
+    controller.mod_port = Mock(return_value=True)
+    incremental = INCREMENTAL_UPDATE_TIME.count()
+    full = UPDATE_LINKS_TIME.count()
+
+    # act
+    controller.topology.add(topo_edges[0])
+    controller.apply_changes(topo_edges[:1])
+    controller.topology.add(topo_edges[1])
+    controller.apply_changes(topo_edges)
+
+    # assert
+    assert_equals(incremental + 1, INCREMENTAL_UPDATE_TIME.count())
+    assert_equals(full + 1, UPDATE_LINKS_TIME.count())
@@ -0,0 +1,117 @@
+# Copyright (C) 2014 Andrea Biancini <andrea.biancini@gmail.com>.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+__author__ = 'Andrea Biancini <andrea.biancini@gmail.com>'
+
+class TopologyIndex(object):
+    def __init__(self, links=(), version=0):
+        self.edges = set()
+        self.ports = {}
+        self.switches = {}
+        # Bumped on every change, so that results computed on an older
+        # snapshot of the topology can be recognized
+        self.version = version
+        for link in links:
+            self.add(link)
+
+    def __contains__(self, link):
+        return link in self.edges
+
+    def __iter__(self):
+        return iter(self.edges)
+
+    def __len__(self):
+        return len(self.edges)
+
+    def get(self, dpid, port_no):
+        return self.ports.get((dpid, port_no))
+
+    def find(self, key):
+        stored = self.ports.get(key[0])
+        if stored is None or stored.key != key:
+            return None
+        return stored
+
+    def snapshot(self):
+        return self.version, list(self.edges)
+
+    def links(self, dpid):
+        return self.switches.get(dpid, frozenset())
+
+    def add(self, link):
+        if link in self.edges:
+            return []
+
+        # A port is attached to a single link: anything still indexed on
+        # one of the endpoints is stale and gets evicted
+        evicted = []
+        for endpoint in link.key:
+            stale = self.ports.get(endpoint)
+            if stale is not None:
+                self._discard(stale)
+                evicted.append(stale)
+
+        self.edges.add(link)
+        for dpid, port_no in link.key:
+            self.ports[(dpid, port_no)] = link
+            self.switches.setdefault(dpid, set()).add(link)
+        self.version += 1
+        return evicted
+
+    def replace(self, link):
+        # Swap the stored instance of a link, e.g. after a cost change
+        stored = self.find(link.key)
+        if stored is None:
+            return None
+
+        self.edges.discard(stored)
+        self.edges.add(link)
+        for dpid, port_no in link.key:
+            self.ports[(dpid, port_no)] = link
+            incident = self.switches[dpid]
+            incident.discard(stored)
+            incident.add(link)
+        self.version += 1
+        return stored
+
+    def remove(self, key):
+        stored = self.find(key)
+        if stored is not None:
+            self._discard(stored)
+        return stored
+
+    def remove_port(self, dpid, port_no):
+        stored = self.ports.get((dpid, port_no))
+        if stored is not None:
+            self._discard(stored)
+        return stored
+
+    def remove_switch(self, dpid):
+        links = list(self.switches.get(dpid, ()))
+        for link in links:
+            self._discard(link)
+        return links
+
+    def _discard(self, link):
+        self.edges.discard(link)
+        self.version += 1
+        for dpid, port_no in link.key:
+            if self.ports.get((dpid, port_no)) is link:
+                del self.ports[(dpid, port_no)]
+            incident = self.switches.get(dpid)
+            if incident is not None:
+                incident.discard(link)
+                if not incident:
+                    del self.switches[dpid]
@@ -24,20 +24,67 @@ def singleton(class_):
   return getinstance
 
 @singleton
-class TopologyCosts():
+class TopologyCosts(object):
     DEFAULT_COST = 1
 
     def __init__(self, *args, **kwargs):
-        self.costs = {}
+        # Costs are symmetric: they are stored once under the lower dpid,
+        # as store[min_dpid][max_dpid], so lookups build no keys
+        self.store = {}
+        self.version = 0
+
+    @property
+    def costs(self):
+        costs = {}
+        for source, destination, cost in self.items():
+            costs['%s,%s' % (source, destination)] = cost
+        return costs
+
+    @costs.setter
+    def costs(self, new_costs):
+        # The new costs are all parsed before replacing the current ones, so
+        # that invalid costs leave the table unchanged
+        store = {}
+        for source, destination, cost in self.parse(new_costs):
+            if source > destination:
+                source, destination = destination, source
+            store.setdefault(source, {})[destination] = cost
+        self.store = store
+        self.version += 1
+
+    @staticmethod
+    def parse(new_costs):
+        # Accepts the REST representation, either a dict or a list of
+        # dicts mapping 'source,destination' to the cost
+        if isinstance(new_costs, dict):
+            new_costs = [new_costs]
+
+        for costs in new_costs:
+            for key, cost in costs.items():
+                source, destination = key.split(',')
+                yield int(source), int(destination), int(cost)
+
+    def items(self):
+        for source, costs in self.store.items():
+            for destination, cost in costs.items():
+                yield source, destination, cost
+
+    def update(self, new_costs):
+        for source, destination, cost in self.parse(new_costs):
+            self.set_cost(source, destination, cost)
 
     def set_cost(self, source, destination, cost):
-        self.costs['%s,%s' % (source, destination)] = cost
+        if source > destination:
+            source, destination = destination, source
+        self.store.setdefault(source, {})[destination] = cost
+        self.version += 1
 
     def get_cost(self, source, destination):
-        if '%s,%s' % (source, destination) in self.costs:
-            return int(self.costs['%s,%s' % (source, destination)])
-        elif '%s,%s' % (destination, source) in self.costs:
-            return int(self.costs['%s,%s' % (destination, source)])
-        else:
-            self.costs['%s,%s' % (destination, source)] = self.DEFAULT_COST
-            return self.DEFAULT_COST
+        if source > destination:
+            source, destination = destination, source
+        costs = self.store.get(source)
+        if costs is not None:
+            cost = costs.get(destination)
+            if cost is not None:
+                return cost
+        return self.DEFAULT_COST
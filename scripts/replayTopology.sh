@@ -0,0 +1,23 @@
+#!/bin/bash
+
+# Usage: replayTopology.sh [fat-tree|leaf-spine|torus|random-geometric|full-mesh] [events]
+TOPOLOGY="fat-tree"
+if [ "$1" != "" ]; then
+  TOPOLOGY="$1"
+fi
+
+EVENTS="1000"
+if [ "$2" != "" ]; then
+  EVENTS="$2"
+fi
+
+case $TOPOLOGY in
+  fat-tree) ARGUMENTS="8" ;;
+  leaf-spine) ARGUMENTS="32 8" ;;
+  torus) ARGUMENTS="10 10" ;;
+  random-geometric) ARGUMENTS="200 0.12" ;;
+  full-mesh) ARGUMENTS="30" ;;
+esac
+
+cd "$(dirname "$0")/.."
+python -m greenmst.benchmark.replay --topology $TOPOLOGY --arguments $ARGUMENTS --events $EVENTS
@@ -0,0 +1,16 @@
+#!/bin/bash
+
+# Usage: runBenchmarks.sh [small|medium|large] [baseline.json]
+SIZE="small"
+if [ "$1" != "" ]; then
+  SIZE="$1"
+fi
+
+OUTPUT="benchmark-$SIZE-$(date +%Y%m%d%H%M%S).json"
+
+cd "$(dirname "$0")/.."
+if [ "$2" != "" ]; then
+  python -m greenmst.benchmark --size $SIZE --output $OUTPUT --compare $2
+else
+  python -m greenmst.benchmark --size $SIZE --output $OUTPUT
+fi